@@ -1,27 +1,109 @@
+import asyncio
+import contextlib
+import itertools
+import math
+import os
+import secrets
 import uuid
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 from typing import Annotated, Any
 
-from fastapi import Depends, FastAPI, HTTPException
+import orjson
+from fastapi import (
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import Session
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from models import FrontierBlueprint
-from schema import CraftingSession, CraftingTarget, create_db_and_tables, get_session
-from tools import create_crafting_json, item_search
+import repository
+from bom import CycleError, Strategy
+from cache import session_reads
+from catalog import (
+    CATALOG_WATCH_INTERVAL,
+    CatalogError,
+    get_catalog,
+    reload_catalog,
+    watch_catalog,
+)
+from ccp import refresh_types
+from events import broker, session_channel
+from hauling import HaulingError, plan_trips
+from metrics import (
+    MetricsMiddleware,
+    metrics_response,
+    record_cache_lookup,
+    track_queries,
+)
+from models import (
+    FrontierBlueprint,
+    HaulingPlan,
+    IngredientUpdate,
+    InventoryItem,
+    InventoryLevel,
+    Plan,
+    PlanHaulingRequest,
+    PlanRequest,
+    RawMaterial,
+    RemainingNeed,
+    TargetsQuery,
+    UsedIn,
+)
+from planner import PlanError, build_plan, expand_plan, plan_raw_materials, plan_steps
+from profiling import PROFILE_SLOW_MS, ProfiledRoute, SlowRequestProfiler
+from remaining import remaining_needs
+from schema import CraftingTarget, create_db_and_tables, engine, get_session
+from serve import WORKER_MODE_ENV
+from transfer import (
+    MEDIA_TYPES,
+    PLAN_FIELDS,
+    SESSION_FIELDS,
+    ExportFormat,
+    SessionImportError,
+    decode_records,
+    encode_records,
+    iterate,
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # Startup
-    create_db_and_tables()
+    await create_db_and_tables()
+    await asyncio.to_thread(lambda: get_catalog().warm())
+    background_tasks: list[asyncio.Task] = []
+    # refresh the types cache off the request path, the catalog watcher picks up any changes.
+    # serve.py refreshes it once in the parent process instead of once per worker
+    if not os.environ.get(WORKER_MODE_ENV):
+        background_tasks.append(asyncio.create_task(refresh_types()))
+    if CATALOG_WATCH_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(watch_catalog()))
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    for task in background_tasks:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
 
 
-app = FastAPI(lifespan=lifespan)
-SessionDep = Annotated[Session, Depends(get_session)]
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+SessionDep = Annotated[AsyncSession, Depends(get_session)]
+# revalidated on every use, the ETag keeps that a 304 while a reload of the game data takes effect right away
+ITEM_CACHE_CONTROL = "public, no-cache"
+# the admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get("CRAFTER_ADMIN_TOKEN")
+# set on a page of targets when there may be more, pass it back as the after parameter
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
 
 
 # Add CORS middleware
@@ -35,70 +117,420 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
-
-blueprints, item_types = create_crafting_json("blueprint.db", "typelistSelection.json", "typelist.json")
+app.add_middleware(MetricsMiddleware)
+if PROFILE_SLOW_MS is not None:
+    app.add_middleware(SlowRequestProfiler, slow_ms=PROFILE_SLOW_MS)
+    # set before the routes below are added, so the sync endpoints are sampled in their threadpool thread
+    app.router.route_class = ProfiledRoute
+track_queries(engine.sync_engine)
 
 
-@app.get("/items/{item_id}")
-def get_item(item_id: int) -> list[FrontierBlueprint]:
+@app.get("/items/{item_id}", response_model=list[FrontierBlueprint])
+def get_item(item_id: int, if_none_match: Annotated[str | None, Header()] = None) -> Response:
     """
     Return an item by its item ID
     """
-    if item_id not in blueprints:
+    catalog = get_catalog()
+    body = catalog.item_response(item_id)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+
+    etag = catalog.etag(f"item-{item_id}")
+    headers = {"ETag": etag, "Cache-Control": ITEM_CACHE_CONTROL}
+    not_modified = if_none_match is not None and bool({etag, "*"} & {tag.strip() for tag in if_none_match.split(",")})
+    record_cache_lookup("item_etag", hit=not_modified)
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/items/{item_id}/raw-materials")
+def get_raw_materials(
+    item_id: int,
+    quantity: Annotated[int, Query(ge=1)] = 1,
+    strategy: Strategy = "min",
+    blueprint_id: int | None = None,
+) -> list[RawMaterial]:
+    """
+    Return the full raw material breakdown to craft quantity of an item.
+    Intermediate blueprints are picked by strategy, blueprint_id forces the blueprint used for the item itself.
+    """
+    catalog = get_catalog()
+    if item_id not in catalog.blueprints:
         raise HTTPException(status_code=404, detail="Item not found")
 
-    return [FrontierBlueprint.model_validate(bp) for bp in blueprints[item_id]]
+    table = catalog.bom(strategy)
+    try:
+        if blueprint_id is None:
+            raw = table.raw_materials(item_id)
+        else:
+            bp = catalog.blueprints.blueprint(item_id, blueprint_id)
+            if bp is None:
+                raise HTTPException(status_code=404, detail="Blueprint not found")
+            raw = table.blueprint_vector(bp)
+    except CycleError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+
+    return [
+        RawMaterial(type_id=type_id, name=catalog.item_types.get(type_id, {}).get("name", "Unknown"), quantity=amount * quantity)
+        for type_id, amount in sorted(raw.items())
+    ]
+
+
+@app.get("/items/{item_id}/used-in")
+def get_used_in(item_id: int, transitive: bool = False) -> list[UsedIn]:  # noqa: FBT001, FBT002
+    """
+    Return the blueprints that consume an item as a material.
+    With transitive, also return the blueprints consuming anything crafted from the item, material_id tells which one.
+    """
+    catalog = get_catalog()
+    materials = [item_id]
+    if transitive:
+        materials.extend(sorted(catalog.downstream(item_id) - {item_id}))
+
+    used_in = [
+        UsedIn(bp_id=bp.bp_id, product_id=bp.product_id, product_name=bp.product_name, material_id=material_id, quantity=quantity)
+        for material_id in materials
+        for bp in catalog.blueprints.used_in(material_id)
+        for type_id, quantity in bp.material_pairs()
+        if type_id == material_id
+    ]
+    if not used_in and item_id not in catalog.item_types:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return used_in
+
+
+@app.post("/plan")
+def create_plan(plan_request: PlanRequest) -> Plan:
+    """
+    Build one merged, multi-level build plan for all the requested targets.
+    """
+    try:
+        return build_plan(get_catalog(), plan_request.targets, plan_request.strategy, plan_request.objective, plan_request.owned_structures)
+    except PlanError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    except CycleError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+
+
+@app.post("/plan/export")
+def export_plan(plan_request: PlanRequest, export_format: Annotated[ExportFormat, Query(alias="format")] = "ndjson") -> StreamingResponse:
+    """
+    Stream the steps and raw materials of a build plan as NDJSON or CSV, one line per record.
+
+    Every step's quantity depends on the demand of all the items above it, so the plan is expanded before the
+    first line is sent and errors still get a status code. The records are then built as they are written.
+    """
+    catalog = get_catalog()
+    try:
+        expansion = expand_plan(catalog, plan_request.targets, plan_request.strategy, plan_request.objective, plan_request.owned_structures)
+    except PlanError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    except CycleError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+
+    records = itertools.chain(
+        ({"record": "step", **step.model_dump()} for step in plan_steps(catalog, expansion)),
+        (
+            {"record": "raw_material", "item_id": raw.type_id, "name": raw.name, "needed_quantity": raw.quantity}
+            for raw in plan_raw_materials(catalog, expansion)
+        ),
+    )
+    return StreamingResponse(encode_records(iterate(records), export_format, PLAN_FIELDS), media_type=MEDIA_TYPES[export_format])
+
+
+@app.post("/plan/hauling")
+def create_plan_hauling(hauling_request: PlanHaulingRequest) -> HaulingPlan:
+    """
+    Plan the trips needed to haul the raw materials of a build plan with the given cargo hold.
+    """
+    catalog = get_catalog()
+    try:
+        plan = build_plan(
+            catalog, hauling_request.targets, hauling_request.strategy, hauling_request.objective, hauling_request.owned_structures,
+        )
+        stacks = {material.type_id: math.ceil(material.quantity) for material in plan.raw_materials}
+        return plan_trips(catalog, stacks, hauling_request.cargo_capacity, hauling_request.mass_limit)
+    except (PlanError, HaulingError) as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    except CycleError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
 
 
 @app.get("/search/{item_name}")
-def search_item(item_name: str) -> list[dict[str, Any]]:
+def search_item(
+    item_name: str,
+    limit: Annotated[int | None, Query(ge=1)] = None,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    craftable: bool = False,  # noqa: FBT001, FBT002
+) -> list[dict[str, Any]]:
+    """
+    Search for partial matches of item name, ranked exact, prefix and then substring matches.
+    Use craftable to only return items that have a blueprint.
+    """
+    return get_catalog().search_index.search(item_name, limit, offset, craftable_only=craftable)
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics() -> Response:
+    """
+    Expose request, database, cache and catalog metrics in the Prometheus text format.
+    """
+    body, content_type = metrics_response()
+    return Response(content=body, media_type=content_type)
+
+
+@app.post("/admin/reload-catalog")
+async def reload_game_data(x_admin_token: Annotated[str | None, Header()] = None) -> dict[str, Any]:
     """
-    Search for partial matches of item name and return a dict of item_id to item_name
+    Rebuild the catalog from the game data files and swap it in without a restart.
+    Requests already running finish with the previous catalog.
     """
-    return item_search(item_types, item_name)
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+    try:
+        catalog = await asyncio.to_thread(reload_catalog)
+    except CatalogError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    return {"version": get_catalog().version, "reloaded": catalog is not None}
 
 
 @app.post("/crafting-session")
-def create_crafting_session() -> uuid.UUID:
-    return CraftingSession.create_session(crafting_targets=[])
+async def create_crafting_session(db: SessionDep) -> uuid.UUID:
+    return await repository.create_session(db)
 
 
-@app.get("/crafting-session/{session_uuid}")
-def get_crafting_session(session_uuid: uuid.UUID) -> dict[str, Any]:
-    target_session = CraftingSession.get_session(session_uuid)
-    if target_session is None:
+@app.get("/crafting-session/{session_uuid}", response_model=dict[str, Any])
+async def get_crafting_session(session_uuid: uuid.UUID, db: SessionDep, summary: bool = False) -> Response:  # noqa: FBT001, FBT002
+    """
+    Return a session, with summary set also its target count and ingredient totals.
+    """
+    resource = "summary" if summary else "session"
+    version, body = await session_reads.get(session_uuid, resource)
+    if body is None:
+        target_session = await repository.get_session(db, session_uuid)
+        if target_session is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        result = target_session.model_dump()
+        if summary:
+            result.update(await repository.get_session_summary(db, session_uuid) or {})
+        body = orjson.dumps(result)
+        await session_reads.set(session_uuid, version, resource, body)
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/crafting-session/{session_uuid}/export")
+async def export_session(
+    session_uuid: uuid.UUID, db: SessionDep, export_format: Annotated[ExportFormat, Query(alias="format")] = "ndjson",
+) -> StreamingResponse:
+    """
+    Stream the session's targets, ingredients and inventory as NDJSON or CSV, one line per record.
+    """
+    session_id = await repository.get_session_id(db, session_uuid)
+    if session_id is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    return target_session.model_dump()
+    return StreamingResponse(
+        encode_records(repository.stream_session_records(db, session_id), export_format, SESSION_FIELDS),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="session-{session_uuid}.{export_format}"'},
+    )
+
+
+@app.post("/crafting-session/import")
+async def import_session(request: Request, db: SessionDep, export_format: Annotated[ExportFormat, Query(alias="format")] = "ndjson") -> dict[str, Any]:
+    """
+    Create a new session from the body of a session export, read as it is uploaded and inserted in one transaction.
+    """
+    try:
+        session_uuid, counts = await repository.import_session(db, decode_records(request.stream(), export_format))
+    except SessionImportError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    return {"session_uuid": session_uuid, **counts}
 
 
 @app.post("/crafting-session/{session_uuid}/target")
-def add_target(session_uuid: uuid.UUID, crafting_target: CraftingTarget) -> dict[str, Any]:
-    result = CraftingSession.add_target(session_uuid, crafting_target)
+async def add_target(session_uuid: uuid.UUID, crafting_target: CraftingTarget, db: SessionDep) -> dict[str, Any]:
+    result = await repository.add_target(db, session_uuid, crafting_target)
     if result is None:
         raise HTTPException(status_code=404, detail="Session not found")
     return result.model_dump()
 
 
 @app.post("/crafting-session/{session_uuid}/target/{target_id}/ingredient/{ingredient_id}/{quantity}")
-def modify_ingredient_quantity(session_uuid: uuid.UUID, target_id: int, ingredient_id: int, quantity: int) -> dict[str, Any]:
-    result = CraftingSession.modify_ingredent_quantity(session_uuid, target_id, ingredient_id, quantity)
+async def modify_ingredient_quantity(session_uuid: uuid.UUID, target_id: int, ingredient_id: int, quantity: int, db: SessionDep) -> dict[str, Any]:
+    ingredient = await repository.modify_ingredient_quantity(db, session_uuid, target_id, ingredient_id, quantity)
+    if ingredient is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {**ingredient.model_dump(), "session_uuid": session_uuid}
+
+
+@app.post("/crafting-session/{session_uuid}/ingredients")
+async def modify_ingredient_quantities(session_uuid: uuid.UUID, updates: list[IngredientUpdate], db: SessionDep) -> dict[str, Any]:
+    """
+    Apply many ingredient increments atomically, if any ingredient is unknown nothing is applied.
+    """
+    try:
+        ingredients = await repository.modify_ingredient_quantities(db, session_uuid, updates)
+    except repository.IngredientNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    if ingredients is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"session_uuid": session_uuid, "ingredients": [ingredient.model_dump() for ingredient in ingredients]}
+
+
+@app.post("/crafting-session/{session_uuid}/ingredients/distribute")
+async def distribute_ingredients(session_uuid: uuid.UUID, items: list[InventoryItem], db: SessionDep) -> dict[str, Any]:
+    """
+    Spread an inventory dump across every target in the session that still needs those items.
+    """
+    quantities: dict[int, int] = {}
+    for item in items:
+        quantities[item.item_id] = quantities.get(item.item_id, 0) + item.quantity
+
+    result = await repository.distribute_ingredients(db, session_uuid, quantities)
     if result is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    return result.model_dump()
+    ingredients, leftover = result
+    return {
+        "session_uuid": session_uuid,
+        "ingredients": [ingredient.model_dump() for ingredient in ingredients],
+        "leftover": [{"item_id": item_id, "quantity": quantity} for item_id, quantity in leftover.items() if quantity > 0],
+    }
+
 
+@app.get("/crafting-session/{session_uuid}/targets", response_model=list[dict[str, Any]])
+async def get_targets(
+    session_uuid: uuid.UUID, db: SessionDep, query: Annotated[TargetsQuery, Query()],
+) -> Response:
+    """
+    Return the session's targets, optionally a page of them, only some fields or with their ingredient totals.
+
+    The ID is always included. With a limit the response carries an X-Next-Cursor header while more targets may follow.
+    """
+    selected = [field.strip() for field in query.fields.split(",") if field.strip()] if query.fields else list(repository.TARGET_FIELDS)
+    if query.summary:
+        selected += repository.SUMMARY_FIELDS
+    unknown = set(selected) - {*repository.TARGET_FIELDS, *repository.SUMMARY_FIELDS}
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
 
-@app.get("/crafting-session/{session_uuid}/targets")
-def get_targets(session_uuid: uuid.UUID) -> list[dict[str, Any]]:
-    session = CraftingSession.get_session(session_uuid)
-    if session is None:
+    # pages of large sessions are cheap range reads, only the full list the web client polls is cached
+    resource = f"targets:{','.join(selected)}:{query.after}"
+    version, body = await session_reads.get(session_uuid, resource) if query.limit is None else ("", None)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+
+    rows = await repository.get_target_rows(db, session_uuid, selected, query.after, query.limit)
+    if rows is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    return [target.model_dump() for target in session.crafting_targets]
+    # plain rows straight from SQL, no model validation on the way out
+    headers = {NEXT_CURSOR_HEADER: str(rows[-1]["id"])} if query.limit is not None and len(rows) == query.limit else None
+    body = orjson.dumps(rows)
+    if query.limit is None:
+        await session_reads.set(session_uuid, version, resource, body)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
-@app.get("/crafting-session/{session_uuid}/target/{target_item_id}/ingredients")
-def get_target_ingredients(session_uuid: uuid.UUID, target_item_id: int) -> list[dict[str, Any]]:
-    ingredients = CraftingSession.get_target_ingredients(session_uuid, target_item_id)
-    if ingredients is None:
-        raise HTTPException(status_code=404, detail="Ingredients not found")
-    return [ingredient.model_dump() for ingredient in ingredients]
+@app.get("/crafting-session/{session_uuid}/target/{target_item_id}/ingredients", response_model=list[dict[str, Any]])
+async def get_target_ingredients(session_uuid: uuid.UUID, target_item_id: int, db: SessionDep) -> Response:
+    resource = f"ingredients:{target_item_id}"
+    version, body = await session_reads.get(session_uuid, resource)
+    if body is None:
+        ingredients = await repository.get_target_ingredients(db, session_uuid, target_item_id)
+        if ingredients is None:
+            raise HTTPException(status_code=404, detail="Ingredients not found")
+        body = orjson.dumps([ingredient.model_dump() for ingredient in ingredients])
+        await session_reads.set(session_uuid, version, resource, body)
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/crafting-session/{session_uuid}/hauling")
+async def get_session_hauling(
+    session_uuid: uuid.UUID,
+    db: SessionDep,
+    cargo_capacity: Annotated[float, Query(gt=0)],
+    mass_limit: Annotated[float | None, Query(gt=0)] = None,
+) -> HaulingPlan:
+    """
+    Plan the trips needed to haul every ingredient the session still needs with the given cargo hold.
+    """
+    remaining = await repository.get_remaining_ingredients(db, session_uuid)
+    if remaining is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    try:
+        return plan_trips(await asyncio.to_thread(get_catalog), remaining, cargo_capacity, mass_limit)
+    except HaulingError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+
+@app.get("/crafting-session/{session_uuid}/inventory")
+async def get_inventory(session_uuid: uuid.UUID, db: SessionDep) -> list[InventoryItem]:
+    inventory = await repository.get_inventory(db, session_uuid)
+    if inventory is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return [InventoryItem(item_id=item_id, quantity=quantity) for item_id, quantity in sorted(inventory.items())]
+
+
+@app.put("/crafting-session/{session_uuid}/inventory")
+async def set_inventory(session_uuid: uuid.UUID, items: list[InventoryLevel], db: SessionDep) -> list[InventoryItem]:
+    """
+    Set the quantities the session has on hand for the listed items, other items are left as they are.
+    """
+    inventory = await repository.set_inventory(db, session_uuid, {item.item_id: item.quantity for item in items})
+    if inventory is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return [InventoryItem(item_id=item_id, quantity=quantity) for item_id, quantity in sorted(inventory.items())]
+
+
+@app.get("/crafting-session/{session_uuid}/remaining")
+async def get_remaining(session_uuid: uuid.UUID, db: SessionDep) -> list[RemainingNeed]:
+    """
+    Return everything the session still has to gather or craft, down to raw materials, after its inventory.
+    """
+    demand = await repository.get_remaining_ingredients(db, session_uuid)
+    inventory = await repository.get_inventory(db, session_uuid)
+    if demand is None or inventory is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return remaining_needs(await asyncio.to_thread(get_catalog), session_uuid, demand, inventory).needs()
+
+
+@app.websocket("/crafting-session/{session_uuid}/ws")
+async def session_updates(websocket: WebSocket, session_uuid: uuid.UUID) -> None:
+    """
+    Push a small delta message every time a target is added or an ingredient quantity changes.
+    """
+    # a short lived session, a dependency would hold a pooled connection for as long as the socket is open
+    async with AsyncSession(engine) as db:
+        session_id = await repository.get_session_id(db, session_uuid)
+    if session_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    async with broker.subscribe(session_channel(session_uuid)) as messages:
+
+        async def forward() -> None:
+            try:
+                async for message in messages:
+                    await websocket.send_json(message)
+            except Exception as error:  # noqa: BLE001
+                # the client would otherwise keep an open socket that no longer receives updates
+                print(f"Stopped sending updates of session {session_uuid}: {error!r}")
+                with contextlib.suppress(RuntimeError, WebSocketDisconnect):
+                    await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+
+        forward_task = asyncio.create_task(forward())
+        try:
+            # clients don't send anything, receiving only detects the disconnect
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            forward_task.cancel()
+            await asyncio.wait((forward_task,))
@@ -0,0 +1,47 @@
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+import catalog
+from benchmarks.synthetic import write_game_data
+from catalog import Catalog, load_catalog
+
+DEFAULT_CATALOG_TYPES = 10_000
+DEFAULT_RECIPE_DEPTH = 8
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption("--catalog-types", type=int, default=DEFAULT_CATALOG_TYPES, help="number of item types in the synthetic catalog")
+    parser.addoption("--recipe-depth", type=int, default=DEFAULT_RECIPE_DEPTH, help="levels of recipes above the raw materials")
+
+
+@pytest.fixture(scope="package")
+def game_data(request: pytest.FixtureRequest, tmp_path_factory: pytest.TempPathFactory) -> Generator[tuple[Path, list[list[int]]], None, None]:
+    """
+    Generate the synthetic game data once per run and run from its directory, where the catalog reads the types cache.
+    Package scoped, so the working directory is restored before any test outside the benchmarks runs.
+    """
+    directory = tmp_path_factory.mktemp("game-data")
+    tiers = write_game_data(directory, request.config.getoption("--catalog-types"), request.config.getoption("--recipe-depth"))
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(directory)
+        yield directory, tiers
+
+
+@pytest.fixture(scope="package")
+def tiers(game_data: tuple[Path, list[list[int]]]) -> list[list[int]]:
+    return game_data[1]
+
+
+@pytest.fixture(scope="package")
+def synthetic_catalog(game_data: tuple[Path, list[list[int]]]) -> Generator[Catalog, None, None]:  # noqa: ARG001
+    """
+    The warmed synthetic catalog, also returned by get_catalog while the benchmarks run.
+    Depends on game_data to run from the generated game data directory.
+    """
+    loaded = load_catalog()
+    loaded.warm()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(catalog, "_catalog", loaded)
+        yield loaded
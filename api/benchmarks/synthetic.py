@@ -0,0 +1,89 @@
+import json
+import random
+import sqlite3
+from pathlib import Path
+
+from catalog import (
+    BLUEPRINT_DB_FILENAME,
+    STRUCTURE_NAMES_FILENAME,
+    STRUCTURE_TYPES_FILENAME,
+)
+from ccp import TYPES_CACHE_FILENAME, TypesCache
+
+WORDS = (
+    "Carbon", "Silicon", "Iron", "Fused", "Reinforced", "Thermal", "Quantum", "Hull", "Plate", "Weave",
+    "Wafer", "Core", "Lattice", "Coil", "Matrix", "Frame", "Cell", "Array", "Shield", "Drive",
+    "Relay", "Vessel", "Strut", "Circuit", "Filament", "Crystal", "Alloy", "Resin", "Module", "Beacon",
+)
+STRUCTURES = ("Printer", "Assembler", "Refinery", "Shipyard", "Mini Printer")
+FIRST_TYPE_ID = 100_000
+FIRST_BLUEPRINT_ID = 900_000
+
+
+def tiers(types: int, depth: int) -> list[list[int]]:
+    """
+    Split the type IDs into depth + 1 tiers, tier 0 are the raw materials.
+    """
+    raw = max(types // 10, 1)
+    crafted = max(types - raw, depth)
+    type_ids = list(range(FIRST_TYPE_ID, FIRST_TYPE_ID + raw + crafted))
+    result = [type_ids[:raw]]
+    per_tier = crafted // depth
+    for tier in range(depth):
+        start = raw + tier * per_tier
+        end = raw + crafted if tier == depth - 1 else start + per_tier
+        result.append(type_ids[start:end])
+    return result
+
+
+def write_game_data(directory: Path, types: int, depth: int, seed: int = 0) -> list[list[int]]:
+    """
+    Write a generated blueprint.db, structure lists and types cache into the directory and return the tiers.
+
+    Every item of tier n is crafted from one to four items of lower tiers, always including one of tier n - 1,
+    so the items of the last tier have depth levels of recipes. About one in ten items has an alternative blueprint.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    item_tiers = tiers(types, depth)
+
+    item_types = {}
+    for type_id in (type_id for tier in item_tiers for type_id in tier):
+        name = " ".join(rng.sample(WORDS, rng.randint(2, 3)))
+        item_types[type_id] = {"id": type_id, "name": f"{name} {type_id - FIRST_TYPE_ID}", "mass": rng.uniform(0.1, 500), "volume": rng.uniform(0.01, 50)}
+
+    blueprints: list[dict] = []
+    structure_types: dict[str, list[int]] = {structure: [] for structure in STRUCTURES}
+    for tier in range(1, len(item_tiers)):
+        lower = [type_id for lower_tier in item_tiers[:tier] for type_id in lower_tier]
+        for product_id in item_tiers[tier]:
+            for _ in range(2 if rng.random() < 0.1 else 1):  # noqa: PLR2004
+                materials = {rng.choice(item_tiers[tier - 1])} | set(rng.sample(lower, min(len(lower), rng.randint(0, 3))))
+                bp_id = FIRST_BLUEPRINT_ID + len(blueprints)
+                blueprints.append(
+                    {
+                        "blueprintTypeID": bp_id,
+                        "maxProductionLimit": rng.randint(1, 1000),
+                        "activities": {
+                            "manufacturing": {
+                                "products": [{"typeID": product_id, "quantity": rng.randint(1, 3)}],
+                                "materials": [{"typeID": material_id, "quantity": rng.randint(1, 20)} for material_id in sorted(materials)],
+                                "time": rng.randint(5, 600),
+                            },
+                        },
+                    },
+                )
+                for structure in rng.sample(STRUCTURES, rng.randint(1, 2)):
+                    structure_types[structure].append(bp_id)
+
+    with sqlite3.connect(directory / BLUEPRINT_DB_FILENAME) as connection:
+        connection.execute("CREATE TABLE cache (key INTEGER PRIMARY KEY, value TEXT)")
+        connection.executemany("INSERT INTO cache (value) VALUES (?)", ((json.dumps(bp),) for bp in blueprints))
+    connection.close()
+
+    structure_ids = {structure: str(FIRST_BLUEPRINT_ID - index - 1) for index, structure in enumerate(STRUCTURES)}
+    (directory / STRUCTURE_NAMES_FILENAME).write_text(json.dumps({structure_ids[name]: {"name": name} for name in STRUCTURES}))
+    (directory / STRUCTURE_TYPES_FILENAME).write_text(
+        json.dumps({structure_ids[name]: {"includedTypeIDs": bp_ids} for name, bp_ids in structure_types.items()}),
+    )
+    TypesCache(str(directory / TYPES_CACHE_FILENAME)).save(item_types, None, None)
+    return item_tiers
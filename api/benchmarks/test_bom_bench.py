@@ -0,0 +1,70 @@
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from bom import RawMaterialTable
+from catalog import Catalog
+from models import PlanTarget
+from planner import build_plan
+from remaining import RemainingNeeds
+from solver import BlueprintSolver, Objective
+
+PLAN_TARGETS = 10
+
+
+@pytest.mark.benchmark(group="bom")
+def test_raw_material_table(benchmark: BenchmarkFixture, synthetic_catalog: Catalog) -> None:
+    """
+    Expand every item of the catalog down to raw materials.
+    """
+    table = benchmark(RawMaterialTable, synthetic_catalog.blueprints, "min")
+    benchmark.extra_info["items"] = len(table.raw)
+
+
+@pytest.mark.benchmark(group="bom")
+def test_raw_materials_deepest_items(benchmark: BenchmarkFixture, synthetic_catalog: Catalog, tiers: list[list[int]]) -> None:
+    table = synthetic_catalog.bom()
+
+    def lookup_all() -> None:
+        for item_id in tiers[-1]:
+            table.raw_materials(item_id)
+
+    benchmark(lookup_all)
+
+
+@pytest.mark.benchmark(group="bom")
+def test_build_plan(benchmark: BenchmarkFixture, synthetic_catalog: Catalog, tiers: list[list[int]]) -> None:
+    """
+    Plan the deepest items together, every intermediate step merged.
+    """
+    targets = [PlanTarget(item_id=item_id, quantity=10) for item_id in tiers[-1][:PLAN_TARGETS]]
+    plan = benchmark(build_plan, synthetic_catalog, targets, "min")
+    benchmark.extra_info["steps"] = len(plan.steps)
+
+
+@pytest.mark.parametrize("objective", ["raw", "time", "structures"])
+@pytest.mark.benchmark(group="solver")
+def test_blueprint_solver(benchmark: BenchmarkFixture, synthetic_catalog: Catalog, objective: Objective) -> None:
+    """
+    Pick the blueprint of every item in the catalog for the objective, limited to two of the structures.
+    """
+    solver = benchmark(BlueprintSolver, synthetic_catalog.blueprints, objective, ["Printer", "Assembler"])
+    benchmark.extra_info["items"] = len(solver.choice)
+
+
+@pytest.mark.benchmark(group="remaining")
+def test_remaining_needs_contribution(benchmark: BenchmarkFixture, synthetic_catalog: Catalog, tiers: list[list[int]]) -> None:
+    """
+    Update the expanded needs of a session after one small contribution, alternating between two inventories.
+    """
+    demand = dict.fromkeys(tiers[-1][:PLAN_TARGETS], 10)
+    contributed = tiers[-2][0]
+    needs = RemainingNeeds(synthetic_catalog)
+    needs.update(demand, {})
+    inventories = [{contributed: 1}, {}]
+
+    def contribute() -> None:
+        inventories.reverse()
+        needs.update(demand, inventories[0])
+
+    benchmark(contribute)
+    benchmark.extra_info["items"] = len(needs.gross)
@@ -0,0 +1,75 @@
+import pytest
+from fastapi.testclient import TestClient
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from api import app
+from catalog import (
+    BLUEPRINT_DB_FILENAME,
+    SNAPSHOT_FILENAME,
+    STRUCTURE_NAMES_FILENAME,
+    STRUCTURE_TYPES_FILENAME,
+    Catalog,
+    build_snapshot,
+    load_catalog,
+    load_snapshot,
+)
+
+
+@pytest.mark.benchmark(group="startup")
+@pytest.mark.usefixtures("game_data")
+def test_build_snapshot(benchmark: BenchmarkFixture) -> None:
+    """
+    Cold startup after the game data changed: compile the sources and write the snapshot.
+    """
+    benchmark.pedantic(
+        build_snapshot, args=(SNAPSHOT_FILENAME, BLUEPRINT_DB_FILENAME, STRUCTURE_NAMES_FILENAME, STRUCTURE_TYPES_FILENAME), rounds=3,
+    )
+
+
+@pytest.mark.benchmark(group="startup")
+def test_load_catalog(benchmark: BenchmarkFixture, synthetic_catalog: Catalog) -> None:
+    """
+    Startup with a current snapshot: hash the sources and map the snapshot.
+    """
+    assert benchmark(load_catalog).version == synthetic_catalog.version
+
+
+@pytest.mark.benchmark(group="startup")
+def test_warm_catalog(benchmark: BenchmarkFixture, synthetic_catalog: Catalog) -> None:
+    """
+    Build the search index and default raw material table of a freshly mapped catalog.
+    """
+
+    def fresh_catalog() -> tuple[tuple[Catalog], dict]:
+        mapped = load_snapshot(SNAPSHOT_FILENAME, synthetic_catalog.version)
+        assert mapped is not None
+        return (mapped,), {}
+
+    benchmark.pedantic(Catalog.warm, setup=fresh_catalog, rounds=5)
+
+
+@pytest.mark.benchmark(group="item lookup")
+def test_item_response_cold(benchmark: BenchmarkFixture, synthetic_catalog: Catalog) -> None:
+    """
+    Validate and serialize the blueprints of every craftable item once.
+    """
+
+    def fresh_catalog() -> tuple[tuple[Catalog], dict]:
+        return (Catalog(synthetic_catalog.version, synthetic_catalog.blueprints, synthetic_catalog.item_types),), {}
+
+    def serialize_all(fresh: Catalog) -> None:
+        for item_id in fresh.blueprints:
+            fresh.item_response(item_id)
+
+    benchmark.pedantic(serialize_all, setup=fresh_catalog, rounds=3)
+
+
+@pytest.mark.benchmark(group="item lookup")
+def test_get_item(benchmark: BenchmarkFixture, synthetic_catalog: Catalog, tiers: list[list[int]]) -> None:
+    """
+    GET /items/{item_id} through the ASGI stack, serialized responses already cached.
+    """
+    client = TestClient(app)
+    item_id = tiers[-1][0]
+    synthetic_catalog.item_response(item_id)
+    assert benchmark(client.get, f"/items/{item_id}").status_code == 200  # noqa: PLR2004
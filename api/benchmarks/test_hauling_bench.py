@@ -0,0 +1,18 @@
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from catalog import Catalog
+from hauling import plan_trips
+
+CARGO_CAPACITY = 5_000.0
+MASS_LIMIT = 200_000.0
+
+
+@pytest.mark.benchmark(group="hauling")
+def test_plan_trips(benchmark: BenchmarkFixture, synthetic_catalog: Catalog, tiers: list[list[int]]) -> None:
+    """
+    Haul 100 units of every raw material and first tier item.
+    """
+    stacks = dict.fromkeys(tiers[0] + tiers[1], 100)
+    hauling = benchmark(plan_trips, synthetic_catalog, stacks, CARGO_CAPACITY, MASS_LIMIT)
+    benchmark.extra_info.update({"stacks": len(stacks), "trips": len(hauling.trips)})
@@ -0,0 +1,48 @@
+import statistics
+import time
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from catalog import Catalog
+
+QUERY_KINDS = ("one letter", "prefix", "word", "substring", "miss")
+
+
+def queries(synthetic_catalog: Catalog, kind: str) -> list[str]:
+    names = [item["name"] for _, item in zip(range(200), synthetic_catalog.item_types.values(), strict=False)]
+    match kind:
+        case "one letter":
+            return [name[:1] for name in names]
+        case "prefix":
+            return [name[:4] for name in names]
+        case "word":
+            return [name.split()[1] for name in names]
+        case "substring":
+            return [name[2:9] for name in names]
+        case _:
+            return [f"{name[:5]}zzz" for name in names]
+
+
+@pytest.mark.benchmark(group="search")
+@pytest.mark.parametrize("kind", QUERY_KINDS)
+def test_search_latency(benchmark: BenchmarkFixture, synthetic_catalog: Catalog, kind: str) -> None:
+    """
+    One round searches every query of the kind, the per query percentiles are recorded in extra_info.
+    """
+    index = synthetic_catalog.search_index
+    kind_queries = queries(synthetic_catalog, kind)
+
+    latencies = []
+    for query in kind_queries:
+        start = time.perf_counter()
+        index.search(query, 20)
+        latencies.append(time.perf_counter() - start)
+    percentiles = statistics.quantiles(latencies, n=100)
+    benchmark.extra_info.update({"queries": len(kind_queries), "p50": percentiles[49], "p95": percentiles[94], "p99": percentiles[98]})
+
+    def search_all() -> None:
+        for query in kind_queries:
+            index.search(query, 20)
+
+    benchmark(search_all)
@@ -0,0 +1,171 @@
+import asyncio
+import uuid
+from collections.abc import AsyncIterator, Generator
+from pathlib import Path
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.pool import StaticPool
+
+import repository
+from catalog import Catalog
+from models import IngredientUpdate, SessionRecord
+from schema import CraftingTarget, apply_sqlite_pragmas
+from transfer import SESSION_FIELDS, encode_records
+
+TARGETS_PER_SESSION = 10
+MUTATIONS_PER_ROUND = 100
+IMPORT_TARGETS = 2000
+INGREDIENTS_PER_TARGET = 4
+
+
+@pytest.fixture(name="database", params=["memory", "file"])
+def database_fixture(request: pytest.FixtureRequest, tmp_path: Path) -> Generator[tuple[asyncio.Runner, AsyncEngine], None, None]:
+    """
+    A database with the production SQLite pragmas and the event loop its connections belong to.
+    """
+    if request.param == "memory":
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    else:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'crafting_tool.db'}")
+    event.listen(engine.sync_engine, "connect", apply_sqlite_pragmas)
+
+    async def create_tables() -> None:
+        async with engine.begin() as connection:
+            await connection.run_sync(SQLModel.metadata.create_all)
+
+    with asyncio.Runner() as runner:
+        runner.run(create_tables())
+        yield runner, engine
+        runner.run(engine.dispose())
+
+
+def targets(synthetic_catalog: Catalog, tiers: list[list[int]]) -> list[CraftingTarget]:
+    return [
+        CraftingTarget(item_id=item_id, needed_quantity=1, blueprint_id=synthetic_catalog.blueprints[item_id][0].bp_id)
+        for item_id in tiers[-1][:TARGETS_PER_SESSION]
+    ]
+
+
+async def create_session(engine: AsyncEngine, session_targets: list[CraftingTarget]) -> uuid.UUID:
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        session_uuid = await repository.create_session(db)
+        for target in session_targets:
+            await repository.add_target(db, session_uuid, target)
+    return session_uuid
+
+
+@pytest.mark.benchmark(group="session mutations")
+def test_create_session_with_targets(
+    benchmark: BenchmarkFixture, database: tuple[asyncio.Runner, AsyncEngine], synthetic_catalog: Catalog, tiers: list[list[int]],
+) -> None:
+    runner, engine = database
+    benchmark.pedantic(
+        lambda session_targets: runner.run(create_session(engine, session_targets)),
+        setup=lambda: ((targets(synthetic_catalog, tiers),), {}),
+        rounds=20,
+    )
+
+
+@pytest.mark.benchmark(group="session mutations")
+def test_modify_ingredient_quantity(
+    benchmark: BenchmarkFixture, database: tuple[asyncio.Runner, AsyncEngine], synthetic_catalog: Catalog, tiers: list[list[int]],
+) -> None:
+    """
+    MUTATIONS_PER_ROUND single ingredient increments, each in its own transaction.
+    """
+    runner, engine = database
+    session_targets = targets(synthetic_catalog, tiers)
+    session_uuid = runner.run(create_session(engine, session_targets))
+    increments = [(target.item_id, ingredient.item_id) for target in session_targets for ingredient in target.ingredients]
+
+    async def modify_all() -> None:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            for index in range(MUTATIONS_PER_ROUND):
+                target_id, ingredient_id = increments[index % len(increments)]
+                await repository.modify_ingredient_quantity(db, session_uuid, target_id, ingredient_id, 1)
+
+    benchmark.extra_info["mutations_per_round"] = MUTATIONS_PER_ROUND
+    benchmark(lambda: runner.run(modify_all()))
+
+
+@pytest.mark.benchmark(group="session mutations")
+def test_bulk_ingredient_update(
+    benchmark: BenchmarkFixture, database: tuple[asyncio.Runner, AsyncEngine], synthetic_catalog: Catalog, tiers: list[list[int]],
+) -> None:
+    """
+    MUTATIONS_PER_ROUND ingredient increments applied in one transaction.
+    """
+    runner, engine = database
+    session_targets = targets(synthetic_catalog, tiers)
+    session_uuid = runner.run(create_session(engine, session_targets))
+    increments = [(target.item_id, ingredient.item_id) for target in session_targets for ingredient in target.ingredients]
+    updates = [
+        IngredientUpdate(target_id=target_id, ingredient_id=ingredient_id, delta=1)
+        for target_id, ingredient_id in (increments[index % len(increments)] for index in range(MUTATIONS_PER_ROUND))
+    ]
+
+    async def update_all() -> None:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            await repository.modify_ingredient_quantities(db, session_uuid, updates)
+
+    benchmark.extra_info["mutations_per_round"] = MUTATIONS_PER_ROUND
+    benchmark(lambda: runner.run(update_all()))
+
+
+def session_records(tiers: list[list[int]]) -> list[SessionRecord]:
+    """
+    IMPORT_TARGETS targets with INGREDIENTS_PER_TARGET ingredients each, in export order.
+    """
+    records = []
+    for target_id in range(IMPORT_TARGETS):
+        records.append(SessionRecord(record="target", target_id=target_id, item_id=tiers[-1][target_id % len(tiers[-1])], blueprint_id=1, needed_quantity=1))
+        records.extend(
+            SessionRecord(record="ingredient", target_id=target_id, item_id=item_id, needed_quantity=10)
+            for item_id in tiers[0][:INGREDIENTS_PER_TARGET]
+        )
+    return records
+
+
+@pytest.mark.benchmark(group="session transfer")
+def test_import_session(benchmark: BenchmarkFixture, database: tuple[asyncio.Runner, AsyncEngine], tiers: list[list[int]]) -> None:
+    runner, engine = database
+    records = session_records(tiers)
+
+    async def import_all() -> None:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            await repository.import_session(db, iterate_records(records))
+
+    benchmark.extra_info["rows"] = len(records)
+    benchmark.pedantic(lambda: runner.run(import_all()), rounds=5)
+
+
+@pytest.mark.benchmark(group="session transfer")
+def test_export_session(benchmark: BenchmarkFixture, database: tuple[asyncio.Runner, AsyncEngine], tiers: list[list[int]]) -> None:
+    runner, engine = database
+    records = session_records(tiers)
+
+    async def import_once() -> int:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            session_uuid, _ = await repository.import_session(db, iterate_records(records))
+            session_id = await repository.get_session_id(db, session_uuid)
+        assert session_id is not None
+        return session_id
+
+    session_id = runner.run(import_once())
+
+    async def export_all() -> int:
+        async with AsyncSession(engine) as db:
+            return sum([len(line) async for line in encode_records(repository.stream_session_records(db, session_id), "ndjson", SESSION_FIELDS)])
+
+    benchmark.extra_info["rows"] = len(records)
+    benchmark(lambda: runner.run(export_all()))
+
+
+async def iterate_records(records: list[SessionRecord]) -> AsyncIterator[SessionRecord]:
+    for record in records:
+        yield record
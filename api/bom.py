@@ -0,0 +1,118 @@
+from collections import deque
+from collections.abc import Mapping, Sequence
+from typing import Literal
+
+from store import Blueprint
+
+Strategy = Literal["min", "max"]
+
+
+class CycleError(ValueError):
+    """
+    Raised when an item's recipe tree loops back onto itself.
+    """
+
+    def __init__(self, item_id: int) -> None:
+        super().__init__(f"Item {item_id} is part of a blueprint cycle")
+        self.item_id = item_id
+
+
+def topological_order(blueprints: Mapping[int, Sequence[Blueprint]]) -> tuple[list[int], set[int]]:
+    """
+    Order the craftable items so every item comes after all the craftable materials of all its blueprints.
+    Returns the order and the items that could not be ordered because they are on, or depend on, a cycle.
+    """
+    dependents: dict[int, set[int]] = {item_id: set() for item_id in blueprints}
+    pending: dict[int, int] = {}
+    for item_id, bp_list in blueprints.items():
+        materials = {type_id for bp in bp_list for type_id, _ in bp.material_pairs()}
+        materials &= blueprints.keys()
+        pending[item_id] = len(materials)
+        for material_id in materials:
+            dependents[material_id].add(item_id)
+
+    ready = deque(sorted(item_id for item_id, count in pending.items() if count == 0))
+    order = []
+    while ready:
+        item_id = ready.popleft()
+        order.append(item_id)
+        for dependent in sorted(dependents[item_id]):
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                ready.append(dependent)
+
+    return order, set(blueprints.keys() - set(order))
+
+
+class RawMaterialTable:
+    """
+    Precomputed raw material breakdown for every craftable item.
+
+    The recipe graph is sorted once and each item's raw material vector (raw type ID to quantity per
+    crafted unit) is computed in a single bottom-up pass from the vectors of its materials. Vectors are
+    sparse dicts, most items only need a handful of distinct raw materials.
+
+    For items with several blueprints the strategy picks the blueprint with the lowest ("min") or highest
+    ("max") weighted raw material cost, overrides maps an item ID to the blueprint ID that must be used
+    for it. Weights maps raw type IDs to their cost, by default every raw unit costs 1.
+    """
+
+    def __init__(
+        self,
+        blueprints: Mapping[int, Sequence[Blueprint]],
+        strategy: Strategy = "min",
+        overrides: dict[int, int] | None = None,
+        weights: dict[int, float] | None = None,
+    ) -> None:
+        self.blueprints = blueprints
+        self.strategy = strategy
+        self.overrides = overrides or {}
+        self.weights = weights
+        self.raw: dict[int, dict[int, float]] = {}
+        self.choice: dict[int, int] = {}
+
+        order, self.cyclic = topological_order(blueprints)
+        self.position = {item_id: position for position, item_id in enumerate(order)}
+        for item_id in order:
+            self.raw[item_id], self.choice[item_id] = self._select(item_id)
+
+    def _cost(self, vector: dict[int, float]) -> float:
+        if self.weights is None:
+            return sum(vector.values())
+        return sum(quantity * self.weights.get(type_id, 0) for type_id, quantity in vector.items())
+
+    def _select(self, item_id: int) -> tuple[dict[int, float], int]:
+        bp_list = self.blueprints[item_id]
+        if item_id in self.overrides:
+            # an override that doesn't match any blueprint of the item falls back to the strategy
+            bp_list = [bp for bp in bp_list if bp.bp_id == self.overrides[item_id]] or bp_list
+
+        best_vector: dict[int, float] = {}
+        best_bp_id = 0
+        best_cost = 0.0
+        for bp in bp_list:
+            vector = self.blueprint_vector(bp)
+            cost = self._cost(vector)
+            if not best_bp_id or (cost < best_cost if self.strategy == "min" else cost > best_cost):
+                best_vector, best_bp_id, best_cost = vector, bp.bp_id, cost
+        return best_vector, best_bp_id
+
+    def blueprint_vector(self, bp: Blueprint) -> dict[int, float]:
+        """
+        Return the raw materials needed per unit produced by the blueprint.
+        """
+        vector: dict[int, float] = {}
+        product_count = bp.product_count or 1
+        for material_id, material_quantity in bp.material_pairs():
+            per_unit = material_quantity / product_count
+            for type_id, quantity in self.raw_materials(material_id).items():
+                vector[type_id] = vector.get(type_id, 0.0) + quantity * per_unit
+        return vector
+
+    def raw_materials(self, item_id: int) -> dict[int, float]:
+        """
+        Return the raw materials needed to craft one unit of the item, an uncraftable item is its own raw material.
+        """
+        if item_id in self.cyclic:
+            raise CycleError(item_id)
+        return self.raw.get(item_id, {item_id: 1.0})
@@ -0,0 +1,137 @@
+import os
+import secrets
+import time
+import uuid
+from collections import OrderedDict
+from typing import Protocol
+
+from metrics import record_cache_lookup
+
+# serialized session reads kept per process, 0 seconds disables the cache
+SESSION_CACHE_SIZE_ENV = "CRAFTER_SESSION_CACHE_SIZE"
+SESSION_CACHE_TTL_ENV = "CRAFTER_SESSION_CACHE_TTL"
+SESSION_CACHE_SIZE = int(os.environ.get(SESSION_CACHE_SIZE_ENV, "4096"))
+SESSION_CACHE_TTL = int(os.environ.get(SESSION_CACHE_TTL_ENV, "60"))
+# version keys outlive the entries stored under them, a session read again after that starts from a new version
+VERSION_TTL_FACTOR = 10
+
+
+class CacheBackend(Protocol):
+    """
+    Key/value store for cached reads, the subset of the redis.asyncio client API that is used.
+    """
+
+    async def get(self, name: str) -> bytes | None: ...
+
+    async def set(self, name: str, value: bytes, ex: int | None = None, nx: bool = False) -> object: ...  # noqa: FBT001, FBT002
+
+    async def incr(self, name: str) -> int: ...
+
+
+class InMemoryCache:
+    """
+    In-process LRU cache with an expiry per entry.
+
+    Every worker process has its own, with several workers a write only invalidates the cache of the worker
+    handling it and the others serve their copy until it expires.
+    """
+
+    def __init__(self, max_entries: int = SESSION_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+
+    async def get(self, name: str) -> bytes | None:
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            del self.entries[name]
+            return None
+        self.entries.move_to_end(name)
+        return entry[0]
+
+    async def set(self, name: str, value: bytes, ex: int | None = None, nx: bool = False) -> bool | None:  # noqa: FBT001, FBT002
+        if nx and await self.get(name) is not None:
+            return None
+        self.entries[name] = (value, time.monotonic() + ex if ex is not None else float("inf"))
+        self.entries.move_to_end(name)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return True
+
+    async def incr(self, name: str) -> int:
+        value = int(await self.get(name) or 0) + 1
+        expiry = self.entries[name][1] if name in self.entries else float("inf")
+        self.entries[name] = (str(value).encode(), expiry)
+        self.entries.move_to_end(name)
+        return value
+
+
+class SessionReadCache:
+    """
+    Serialized responses of session reads, keyed by session UUID, the session's version and the resource read.
+
+    Writes bump the session's version instead of finding and deleting its entries, entries of older versions
+    are never read again and age out of the backend. The backend can be swapped for any client with the
+    CacheBackend methods, such as a Redis client shared by all workers.
+
+    A version is only created when a response is stored, after the caller found the session, so reads of
+    unknown sessions don't fill the backend with version keys.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: int = SESSION_CACHE_TTL) -> None:
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def version_key(session_uuid: uuid.UUID) -> str:
+        return f"session:{session_uuid}:version"
+
+    async def create_version(self, session_uuid: uuid.UUID, *, replace: bool = False) -> str | None:
+        """
+        Give the session a new version, unless it already has one and replace isn't set.
+        Returns the new version, None when the session already had one.
+        """
+        # start from a random version, so an expired counter doesn't restart at a number with entries left
+        version = str(secrets.randbits(48))
+        created = await self.backend.set(self.version_key(session_uuid), version.encode(), ex=self.ttl * VERSION_TTL_FACTOR, nx=not replace)
+        return version if created else None
+
+    async def get(self, session_uuid: uuid.UUID, resource: str) -> tuple[str | None, bytes | None]:
+        """
+        Return the session's current version and the cached response for the resource, if there is one.
+        Pass the version back to set() so a response read before a write is never stored under a newer version.
+        """
+        if self.ttl <= 0:
+            return "", None
+        version = await self.backend.get(self.version_key(session_uuid))
+        body = None if version is None else await self.backend.get(f"session:{session_uuid}:{version.decode()}:{resource}")
+        record_cache_lookup("session", hit=body is not None)
+        return None if version is None else version.decode(), body
+
+    async def set(self, session_uuid: uuid.UUID, version: str | None, resource: str, body: bytes) -> None:
+        """
+        Store a response read under the version get() returned, call it only once the session is known to exist.
+        """
+        if self.ttl <= 0:
+            return
+        if version is None:
+            # a write since get() already created a version, the response may predate it so it isn't stored
+            version = await self.create_version(session_uuid)
+            if version is None:
+                return
+        await self.backend.set(f"session:{session_uuid}:{version}:{resource}", body, ex=self.ttl)
+
+    async def invalidate(self, session_uuid: uuid.UUID) -> None:
+        """
+        Move the session to a new version, called after every committed write to it.
+        """
+        if self.ttl <= 0:
+            return
+        if await self.backend.get(self.version_key(session_uuid)) is None:
+            await self.create_version(session_uuid, replace=True)
+        else:
+            await self.backend.incr(self.version_key(session_uuid))
+
+
+session_reads = SessionReadCache(InMemoryCache())
@@ -0,0 +1,432 @@
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+
+from pydantic import TypeAdapter
+
+from bom import RawMaterialTable, Strategy
+from ccp import TYPES_CACHE_FILENAME
+from metrics import CATALOG_LOAD_SECONDS, CATALOG_WARM_SECONDS, record_cache_lookup
+from models import FrontierBlueprint
+from search import SearchIndex
+from solver import BlueprintSolver, Objective
+from store import (
+    FLOAT_TYPECODE,
+    INT_TYPECODE,
+    STORE_ARRAYS,
+    BlueprintStore,
+    PackedItemTypes,
+)
+from tools import create_crafting_json
+
+try:
+    import fcntl
+
+    HAS_FCNTL = True
+except ImportError:  # Windows, where concurrent builds aren't serialized
+    HAS_FCNTL = False
+
+BLUEPRINT_DB_FILENAME = "blueprint.db"
+STRUCTURE_NAMES_FILENAME = "typelistSelection.json"
+STRUCTURE_TYPES_FILENAME = "typelist.json"
+SNAPSHOT_FILENAME = "catalog.snapshot"
+SNAPSHOT_FORMAT = 5
+SNAPSHOT_MAGIC = b"FCCATLOG"
+# magic, format, offset and length of the pickled metadata
+SNAPSHOT_HEADER = struct.Struct("<8sQQQ")
+SNAPSHOT_ALIGNMENT = 8
+# set by serve.py so workers trust the snapshot the parent built instead of hashing the sources again
+SNAPSHOT_VERSION_ENV = "CATALOG_SNAPSHOT_VERSION"
+# seconds between checks of the game data files for changes, 0 disables watching
+CATALOG_WATCH_INTERVAL = float(os.environ.get("CATALOG_WATCH_INTERVAL", "30"))
+# solved blueprint selections kept per catalog, one for each objective and set of owned structures
+SOLVER_CACHE_SIZE = 64
+
+blueprint_list_adapter = TypeAdapter(list[FrontierBlueprint])
+
+
+class CatalogError(RuntimeError):
+    """
+    Raised when the game data files can't be compiled into a catalog.
+    """
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """
+    The compiled game data: blueprints keyed by product ID and item types keyed by type ID.
+    """
+
+    version: str
+    blueprints: BlueprintStore
+    item_types: PackedItemTypes
+
+    @cached_property
+    def search_index(self) -> SearchIndex:
+        return SearchIndex(self.item_types, self.blueprints.keys())
+
+    @cached_property
+    def _item_responses(self) -> dict[int, bytes]:
+        return {}
+
+    def item_response(self, item_id: int) -> bytes | None:
+        """
+        Return the serialized blueprint list for an item, validated and serialized once per catalog.
+        """
+        if item_id not in self.blueprints:
+            return None
+        record_cache_lookup("item_response", hit=item_id in self._item_responses)
+        if item_id not in self._item_responses:
+            validated = blueprint_list_adapter.validate_python([bp.to_dict() for bp in self.blueprints[item_id]])
+            self._item_responses[item_id] = blueprint_list_adapter.dump_json(validated, by_alias=True)
+        return self._item_responses[item_id]
+
+    def etag(self, key: object) -> str:
+        """
+        Return a strong ETag for a resource derived from this catalog version.
+        """
+        return f'"{self.version[:16]}-{key}"'
+
+    @cached_property
+    def _downstream(self) -> dict[int, frozenset[int]]:
+        return {}
+
+    def downstream(self, item_id: int) -> frozenset[int]:
+        """
+        Return every item that needs the item anywhere in its recipe tree, cached per catalog.
+        """
+        record_cache_lookup("downstream", hit=item_id in self._downstream)
+        if item_id not in self._downstream:
+            seen: set[int] = set()
+            pending = [item_id]
+            while pending:
+                for bp in self.blueprints.used_in(pending.pop()):
+                    if bp.product_id not in seen:
+                        seen.add(bp.product_id)
+                        pending.append(bp.product_id)
+            self._downstream[item_id] = frozenset(seen)
+        return self._downstream[item_id]
+
+    @cached_property
+    def _bom_tables(self) -> dict[tuple, RawMaterialTable]:
+        return {}
+
+    def bom(self, strategy: Strategy = "min", weights: dict[int, float] | None = None) -> RawMaterialTable:
+        """
+        Return the precomputed raw material table for the blueprint selection strategy.
+        """
+        key = (strategy, tuple(sorted(weights.items())) if weights else None)
+        record_cache_lookup("bom_table", hit=key in self._bom_tables)
+        if key not in self._bom_tables:
+            self._bom_tables[key] = RawMaterialTable(self.blueprints, strategy, weights=weights)
+        return self._bom_tables[key]
+
+    @cached_property
+    def _solvers(self) -> dict[tuple, BlueprintSolver]:
+        return {}
+
+    def solver(self, objective: Objective = "raw", owned_structures: list[str] | None = None) -> BlueprintSolver:
+        """
+        Return the blueprint selection minimizing the objective, solved once per objective and owned structures.
+        """
+        key = (objective, None if owned_structures is None else frozenset(owned_structures))
+        record_cache_lookup("solver", hit=key in self._solvers)
+        if key not in self._solvers:
+            if len(self._solvers) >= SOLVER_CACHE_SIZE:
+                del self._solvers[next(iter(self._solvers))]
+            self._solvers[key] = BlueprintSolver(self.blueprints, objective, owned_structures)
+        return self._solvers[key]
+
+    def warm(self) -> None:
+        """
+        Build the search index and default raw material table now, so the first requests don't pay for them.
+        """
+        with CATALOG_WARM_SECONDS.time():
+            _ = self.search_index
+            self.bom()
+
+
+def source_hash(*filenames: str) -> str:
+    """
+    Hash the content of the snapshot source files and the types cache, a missing file hashes as empty.
+    """
+    digest = hashlib.sha256(f"format:{SNAPSHOT_FORMAT}".encode())
+    for filename in (*filenames, TYPES_CACHE_FILENAME):
+        digest.update(filename.encode())
+        path = Path(filename)
+        if path.exists():
+            with path.open("rb") as f:
+                digest.update(hashlib.file_digest(f, "sha256").digest())
+    return digest.hexdigest()
+
+
+def load_snapshot(snapshot_filename: str, version: str | None = None) -> Catalog | None:
+    """
+    Map a compiled snapshot if it exists and was built from the given source version, any version if None.
+
+    The store arrays and item types are memoryviews over the mapped file, so every process loading the same
+    snapshot shares one copy of the game data through the page cache. The mapping outlives the file being
+    replaced by a newer snapshot.
+    """
+    path = Path(snapshot_filename)
+    if not path.exists():
+        return None
+
+    with path.open("rb") as f:
+        header = f.read(SNAPSHOT_HEADER.size)
+        if len(header) < SNAPSHOT_HEADER.size:
+            return None
+        magic, snapshot_format, metadata_offset, metadata_length = SNAPSHOT_HEADER.unpack(header)
+        if magic != SNAPSHOT_MAGIC or snapshot_format != SNAPSHOT_FORMAT:
+            return None
+
+        f.seek(metadata_offset)
+        try:
+            # the snapshot is only ever written by write_snapshot on this host
+            metadata = pickle.loads(f.read(metadata_length))  # noqa: S301
+        except (pickle.UnpicklingError, EOFError, AttributeError):
+            print(f"Ignoring unreadable snapshot '{snapshot_filename}'")
+            return None
+        if version is not None and metadata["version"] != version:
+            return None
+
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapped)
+    buffers = {name: view[offset : offset + length] for name, (offset, length) in metadata["buffers"].items()}
+    blueprints = BlueprintStore.from_buffers(
+        {name: buffers[name].cast(INT_TYPECODE) for name in STORE_ARRAYS}, metadata["structure_sets"], metadata["names"],
+    )
+    item_types = PackedItemTypes(
+        buffers["item_type_ids"].cast(INT_TYPECODE),
+        buffers["item_type_offsets"].cast(INT_TYPECODE),
+        buffers["item_type_documents"],
+        buffers["item_type_masses"].cast(FLOAT_TYPECODE),
+        buffers["item_type_volumes"].cast(FLOAT_TYPECODE),
+    )
+    return Catalog(version=metadata["version"], blueprints=blueprints, item_types=item_types)
+
+
+def write_snapshot(snapshot_filename: str, version: str, blueprints: BlueprintStore, item_types: PackedItemTypes) -> Catalog:
+    """
+    Write the catalog to a snapshot file that load_snapshot can map, and return the catalog mapped from it.
+
+    The integer arrays and the item type documents are written raw and aligned, only the small metadata
+    (names, structure lists and where each buffer starts) is pickled at the end of the file.
+    """
+    buffers = {name: getattr(blueprints, name) for name in STORE_ARRAYS}
+    buffers |= {
+        "item_type_ids": item_types.type_ids,
+        "item_type_offsets": item_types.offsets,
+        "item_type_documents": item_types.blob,
+        "item_type_masses": item_types.masses,
+        "item_type_volumes": item_types.volumes,
+    }
+
+    # every build writes its own temporary file, so concurrent builds never write to or replace each other's file
+    path = Path(snapshot_filename)
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False) as f:
+        tmp_path = Path(f.name)
+        try:
+            f.write(bytes(SNAPSHOT_HEADER.size))
+            layout = {}
+            for name, buffer in buffers.items():
+                f.write(bytes(-f.tell() % SNAPSHOT_ALIGNMENT))
+                layout[name] = (f.tell(), f.write(buffer))
+
+            metadata = pickle.dumps(
+                {"version": version, "buffers": layout, "structure_sets": blueprints.structure_sets, "names": blueprints.names},
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+            metadata_offset = f.tell()
+            f.write(metadata)
+            f.seek(0)
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, metadata_offset, len(metadata)))
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    try:
+        # mapped before it's moved into place, another build replacing the snapshot can't change what we read back
+        catalog = load_snapshot(str(tmp_path), version)
+        if catalog is None:
+            msg = f"Failed to read back snapshot '{snapshot_filename}'"
+            raise CatalogError(msg)
+        tmp_path.replace(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return catalog
+
+
+def build_snapshot(
+    snapshot_filename: str, db_filename: str, structure_names_filename: str, item_types_filename: str,
+) -> Catalog:
+    """
+    Compile the game data sources into a snapshot file and return the mapped catalog.
+
+    The catalog maps the file that was written, so this process shares its pages with every other process
+    using the snapshot.
+    """
+    blueprint_dicts, item_type_dicts = create_crafting_json(db_filename, structure_names_filename, item_types_filename)
+    blueprints = BlueprintStore.from_dicts(blueprint_dicts, item_type_dicts)
+    # hashed after the build since the first build also creates the types cache
+    version = source_hash(db_filename, structure_names_filename, item_types_filename)
+    return write_snapshot(snapshot_filename, version, blueprints, PackedItemTypes.from_dict(item_type_dicts))
+
+
+def load_catalog(
+    snapshot_filename: str = SNAPSHOT_FILENAME,
+    db_filename: str = BLUEPRINT_DB_FILENAME,
+    structure_names_filename: str = STRUCTURE_NAMES_FILENAME,
+    item_types_filename: str = STRUCTURE_TYPES_FILENAME,
+) -> Catalog:
+    """
+    Load the catalog from the snapshot, rebuilding the snapshot when the sources changed.
+    """
+    version = os.environ.get(SNAPSHOT_VERSION_ENV) or source_hash(db_filename, structure_names_filename, item_types_filename)
+    return load_or_build_catalog(version, snapshot_filename, db_filename, structure_names_filename, item_types_filename)
+
+
+@contextmanager
+def snapshot_lock(snapshot_filename: str) -> Iterator[None]:
+    """
+    Hold an exclusive lock on the snapshot's lock file, a no-op where fcntl isn't available.
+    """
+    if not HAS_FCNTL:
+        yield
+        return
+    with Path(f"{snapshot_filename}.lock").open("a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load_or_build_catalog(
+    version: str, snapshot_filename: str, db_filename: str, structure_names_filename: str, item_types_filename: str,
+) -> Catalog:
+    """
+    Map the snapshot of the given source version, building it first when it's missing or stale.
+
+    Builds are serialized across processes, so when every worker notices the same change only one of them
+    builds and the others map the snapshot it wrote.
+    """
+    start = time.perf_counter()
+    catalog = load_snapshot(snapshot_filename, version)
+    source = "snapshot"
+    if catalog is None:
+        with snapshot_lock(snapshot_filename):
+            # another process may have built this version while we waited for the lock, map its file instead
+            catalog = load_snapshot(snapshot_filename, version)
+            if catalog is None:
+                catalog = build_snapshot(snapshot_filename, db_filename, structure_names_filename, item_types_filename)
+                source = "build"
+    CATALOG_LOAD_SECONDS.labels(source).observe(time.perf_counter() - start)
+    return catalog
+
+
+_catalog: Catalog | None = None
+_catalog_lock = threading.Lock()
+_reload_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """
+    Return the current catalog, loading it on first use.
+    Callers should hold on to the returned catalog for the whole request, a reload swaps in a new object.
+    """
+    global _catalog  # noqa: PLW0603
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = load_catalog()
+    return _catalog
+
+
+def reload_catalog(
+    snapshot_filename: str = SNAPSHOT_FILENAME,
+    db_filename: str = BLUEPRINT_DB_FILENAME,
+    structure_names_filename: str = STRUCTURE_NAMES_FILENAME,
+    item_types_filename: str = STRUCTURE_TYPES_FILENAME,
+) -> Catalog | None:
+    """
+    Load the catalog for the current game data files and swap it in, return None if it's already current.
+
+    The new catalog is warmed before the swap. Requests still holding the previous catalog finish with it, its
+    caches are dropped together with it. The sources are always hashed here, a new snapshot may have been built
+    since the version in SNAPSHOT_VERSION_ENV.
+    """
+    global _catalog  # noqa: PLW0603
+    with _reload_lock:
+        version = source_hash(db_filename, structure_names_filename, item_types_filename)
+        if _catalog is not None and _catalog.version == version:
+            return None
+
+        try:
+            catalog = load_or_build_catalog(version, snapshot_filename, db_filename, structure_names_filename, item_types_filename)
+        except (OSError, sqlite3.Error, json.JSONDecodeError, KeyError) as e:
+            msg = f"Failed to load game data: {e}"
+            raise CatalogError(msg) from e
+        catalog.warm()
+
+        with _catalog_lock:
+            _catalog = catalog
+        return catalog
+
+
+def file_stats(*filenames: str) -> tuple[tuple[int, int, int] | None, ...]:
+    """
+    Return a cheap fingerprint of the files, their inode, size and modification time, None for a missing file.
+    """
+    stats: list[tuple[int, int, int] | None] = []
+    for filename in filenames:
+        try:
+            stat = Path(filename).stat()
+        except FileNotFoundError:
+            stats.append(None)
+        else:
+            stats.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+    return tuple(stats)
+
+
+async def watch_catalog(interval: float = CATALOG_WATCH_INTERVAL) -> None:
+    """
+    Reload the catalog off the event loop whenever the game data files, the types cache or the snapshot change.
+
+    Watching the snapshot lets every worker pick up a snapshot rebuilt by another process.
+    """
+    files = (SNAPSHOT_FILENAME, BLUEPRINT_DB_FILENAME, STRUCTURE_NAMES_FILENAME, STRUCTURE_TYPES_FILENAME, TYPES_CACHE_FILENAME)
+    stats = file_stats(*files)
+    while True:
+        await asyncio.sleep(interval)
+        if file_stats(*files) == stats:
+            continue
+        try:
+            catalog = await asyncio.to_thread(reload_catalog)
+        except CatalogError as e:
+            # keep serving the current catalog, the files may still be being copied
+            print(e)
+            continue
+        # taken after the reload, which may have written the snapshot itself
+        stats = file_stats(*files)
+        if catalog is not None:
+            print(f"Reloaded catalog version {catalog.version}")
+
+
+if __name__ == "__main__":
+    catalog = build_snapshot(SNAPSHOT_FILENAME, BLUEPRINT_DB_FILENAME, STRUCTURE_NAMES_FILENAME, STRUCTURE_TYPES_FILENAME)
+    print(f"Built {SNAPSHOT_FILENAME} version {catalog.version} with {len(catalog.blueprints)} craftable items")
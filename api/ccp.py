@@ -0,0 +1,141 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+CCP_BASE_URL = "https://blockchain-gateway-stillness.live.tech.evefrontier.com"
+TYPES_CACHE_FILENAME = "types_cache.json"
+TYPES_PAGE_SIZE = 1000
+REQUEST_TIMEOUT = 10.0
+REQUEST_RETRIES = 3
+PAGE_CONCURRENCY = 4
+HTTP_SERVER_ERROR = 500
+
+
+class TypesCache:
+    """
+    On-disk copy of the types catalog with the validators needed to revalidate it.
+    """
+
+    def __init__(self, filename: str = TYPES_CACHE_FILENAME) -> None:
+        self.path = Path(filename)
+
+    def load(self) -> dict[str, Any] | None:
+        if not self.path.exists():
+            return None
+        try:
+            with self.path.open() as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            print(f"Ignoring unreadable types cache '{self.path}'")
+            return None
+
+    def types(self) -> dict[int, dict] | None:
+        cached = self.load()
+        if cached is None:
+            return None
+        return {int(item_id): item for item_id, item in cached["types"].items()}
+
+    def save(self, types: dict[int, dict], etag: str | None, last_modified: str | None) -> None:
+        # write to a temporary file first so readers never see a partial cache
+        tmp_path = self.path.with_suffix(f"{self.path.suffix}.tmp")
+        with tmp_path.open("w") as f:
+            json.dump({"etag": etag, "last_modified": last_modified, "types": types}, f)
+        tmp_path.replace(self.path)
+
+
+async def get_with_retry(client: httpx.AsyncClient, url: str, params: dict, headers: dict | None = None) -> httpx.Response:
+    """
+    GET a URL, retrying connection errors and server errors with an exponential backoff.
+    """
+    for attempt in range(REQUEST_RETRIES):
+        try:
+            response = await client.get(url, params=params, headers=headers)
+            if response.status_code < HTTP_SERVER_ERROR:
+                return response
+        except httpx.TransportError:
+            if attempt == REQUEST_RETRIES - 1:
+                raise
+        if attempt < REQUEST_RETRIES - 1:
+            await asyncio.sleep(0.5 * 2**attempt)
+    return response.raise_for_status()
+
+
+def parse_types(page: dict) -> dict[int, dict]:
+    item_types = {}
+    for item in page["data"]:
+        try:
+            item_types[int(item["id"])] = item
+        except KeyError:
+            print(f"KeyError: {item}")
+            continue
+    return item_types
+
+
+async def fetch_all_types_async(client: httpx.AsyncClient, cache: TypesCache) -> bool:
+    """
+    Fetch every page of /v2/types into the cache and return whether the catalog changed.
+
+    The first page is revalidated against the cached ETag / Last-Modified, when the server answers 304 the
+    cache is kept as is. Otherwise the total from the first page's metadata is used to request the remaining
+    pages concurrently.
+    """
+    cached = cache.load()
+    headers = {}
+    if cached is not None:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    response = await get_with_retry(client, "/v2/types", {"limit": TYPES_PAGE_SIZE, "offset": 0}, headers)
+    if response.status_code == httpx.codes.NOT_MODIFIED:
+        return False
+    response.raise_for_status()
+
+    first_page = response.json()
+    item_types = parse_types(first_page)
+    total = first_page.get("metadata", {}).get("total")
+    if total is not None:
+        semaphore = asyncio.Semaphore(PAGE_CONCURRENCY)
+
+        async def fetch_page(offset: int) -> dict[int, dict]:
+            async with semaphore:
+                page = await get_with_retry(client, "/v2/types", {"limit": TYPES_PAGE_SIZE, "offset": offset})
+            page.raise_for_status()
+            return parse_types(page.json())
+
+        pages = await asyncio.gather(*(fetch_page(offset) for offset in range(TYPES_PAGE_SIZE, total, TYPES_PAGE_SIZE)))
+        for page_types in pages:
+            item_types.update(page_types)
+    else:
+        # no metadata to plan with, walk the pages until a short one comes back
+        offset = TYPES_PAGE_SIZE
+        page_size = len(first_page["data"])
+        while page_size == TYPES_PAGE_SIZE:
+            page = await get_with_retry(client, "/v2/types", {"limit": TYPES_PAGE_SIZE, "offset": offset})
+            page.raise_for_status()
+            page_data = page.json()
+            item_types.update(parse_types(page_data))
+            page_size = len(page_data["data"])
+            offset += TYPES_PAGE_SIZE
+
+    if cached is not None and {int(item_id): item for item_id, item in cached["types"].items()} == item_types:
+        # the cache file is part of the snapshot's source hash, rewriting identical types would force a rebuild
+        return False
+    cache.save(item_types, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return True
+
+
+async def refresh_types(cache_filename: str = TYPES_CACHE_FILENAME, base_url: str = CCP_BASE_URL) -> bool:
+    """
+    Refresh the on-disk types cache from the CCP API, keeping the existing cache when the API is unavailable.
+    """
+    async with httpx.AsyncClient(base_url=base_url, timeout=REQUEST_TIMEOUT) as client:
+        try:
+            return await fetch_all_types_async(client, TypesCache(cache_filename))
+        except (httpx.HTTPError, json.JSONDecodeError, KeyError) as e:
+            print(f"Failed to refresh types catalog: {e!r}")
+            return False
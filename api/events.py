@@ -0,0 +1,68 @@
+import asyncio
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from typing import Any, Protocol
+
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class Broker(Protocol):
+    """
+    Publish/subscribe channel used to push session changes to connected clients.
+    """
+
+    async def publish(self, channel: str, message: dict[str, Any]) -> None: ...
+
+    def subscribe(self, channel: str) -> AbstractAsyncContextManager[AsyncIterator[dict[str, Any]]]: ...
+
+
+class InMemoryBroker:
+    """
+    In-process broker, every subscriber gets its own bounded queue.
+
+    Messages are handed to the subscriber's event loop thread-safely, so publishers don't need to run on the
+    same loop. A subscriber that falls behind loses its oldest messages rather than slowing down publishers.
+    Only subscribers in the same process are reached, with several workers live updates need a single worker.
+    """
+
+    def __init__(self) -> None:
+        self.subscribers: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, message: dict[str, Any]) -> None:
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    async def publish(self, channel: str, message: dict[str, Any]) -> None:
+        current_loop = asyncio.get_running_loop()
+        for loop, queue in list(self.subscribers.get(channel, ())):
+            if loop is current_loop:
+                self._deliver(queue, message)
+            else:
+                loop.call_soon_threadsafe(self._deliver, queue, message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[AsyncIterator[dict[str, Any]]]:
+        queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        subscriber = (asyncio.get_running_loop(), queue)
+        self.subscribers.setdefault(channel, set()).add(subscriber)
+
+        async def messages() -> AsyncIterator[dict[str, Any]]:
+            while True:
+                yield await queue.get()
+
+        try:
+            yield messages()
+        finally:
+            self.subscribers[channel].discard(subscriber)
+            if not self.subscribers[channel]:
+                del self.subscribers[channel]
+
+
+def session_channel(session_uuid: uuid.UUID) -> str:
+    return f"crafting-session:{session_uuid}"
+
+
+broker: Broker = InMemoryBroker()
@@ -0,0 +1,135 @@
+import math
+from array import array
+from collections.abc import Mapping
+
+from catalog import Catalog
+from models import HaulingPlan, HaulItem, Trip
+
+# floating point slack, ten 0.1 m3 units fill a 1 m3 cargo hold exactly
+CAPACITY_EPSILON = 1e-9
+
+
+class HaulingError(ValueError):
+    """
+    Raised when a single unit of an item doesn't fit in the cargo hold.
+    """
+
+
+def units_that_fit(remaining: float, unit: float) -> float:
+    if unit <= 0 or math.isinf(remaining):
+        return math.inf
+    return math.floor(remaining / unit + CAPACITY_EPSILON)
+
+
+class TripVolumes:
+    """
+    Remaining volume of every trip in a max segment tree, finds the first trip with room for a unit in O(log trips).
+    """
+
+    def __init__(self) -> None:
+        self.size = 1
+        self.tree = array("d", [-math.inf, -math.inf])
+        self.count = 0
+
+    def append(self, remaining: float) -> int:
+        if self.count == self.size:
+            leaves = self.tree[self.size :]
+            self.size *= 2
+            self.tree = array("d", [-math.inf]) * (2 * self.size)
+            self.tree[self.size : self.size + len(leaves)] = leaves
+            for node in range(self.size - 1, 0, -1):
+                self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+        self.count += 1
+        self.update(self.count - 1, remaining)
+        return self.count - 1
+
+    def update(self, trip: int, remaining: float) -> None:
+        node = self.size + trip
+        self.tree[node] = remaining
+        while node > 1:
+            node //= 2
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def first_fit(self, needed: float, start: int) -> int | None:
+        """
+        Return the first trip from start on with at least the needed volume left.
+        """
+
+        def search(node: int, low: int, high: int) -> int | None:
+            if high <= start or self.tree[node] < needed:
+                return None
+            if node >= self.size:
+                return low
+            middle = (low + high) // 2
+            found = search(2 * node, low, middle)
+            return found if found is not None else search(2 * node + 1, middle, high)
+
+        return search(1, 0, self.size)
+
+
+def plan_trips(catalog: Catalog, stacks: Mapping[int, int], cargo_capacity: float, mass_limit: float | None = None) -> HaulingPlan:
+    """
+    Pack item stacks into as few trips as possible, a stack can be split over several trips.
+
+    Stacks are placed first fit decreasing by unit volume: each stack goes into the earliest trip with room left and
+    whatever doesn't fit spills into the following trips. The mass and volume of all stacks are read in one go from
+    the item type columns of the catalog, the packing itself only works on those arrays.
+    """
+    type_ids = [type_id for type_id, quantity in stacks.items() if quantity > 0]
+    masses, volumes = catalog.item_types.physical(type_ids)
+    max_mass = math.inf if mass_limit is None else mass_limit
+
+    for position, type_id in enumerate(type_ids):
+        if volumes[position] > cargo_capacity + CAPACITY_EPSILON or masses[position] > max_mass + CAPACITY_EPSILON:
+            name = catalog.item_types.get(type_id, {}).get("name", "Unknown")
+            msg = f"One {name} ({volumes[position]} m3, {masses[position]} kg) doesn't fit in the cargo hold"
+            raise HaulingError(msg)
+
+    trip_volumes = TripVolumes()
+    remaining_volume = array("d")
+    remaining_mass = array("d")
+    loads: list[list[tuple[int, int]]] = []
+    for position in sorted(range(len(type_ids)), key=lambda position: (-volumes[position], -masses[position], type_ids[position])):
+        quantity = stacks[type_ids[position]]
+        start = 0
+        while quantity > 0:
+            trip = trip_volumes.first_fit(volumes[position] - CAPACITY_EPSILON, start)
+            if trip is None:
+                trip = trip_volumes.append(cargo_capacity)
+                loads.append([])
+                remaining_volume.append(cargo_capacity)
+                remaining_mass.append(max_mass)
+            fit = int(min(quantity, units_that_fit(remaining_volume[trip], volumes[position]), units_that_fit(remaining_mass[trip], masses[position])))
+            if fit > 0:
+                loads[trip].append((position, fit))
+                remaining_volume[trip] -= fit * volumes[position]
+                remaining_mass[trip] -= fit * masses[position]
+                trip_volumes.update(trip, remaining_volume[trip])
+                quantity -= fit
+            # earlier trips had no room for this item, so neither has this one now
+            start = trip + 1
+
+    # decoded once per item type, a stack split over many trips shows up in all of them
+    names = {position: catalog.item_types.get(type_id, {}).get("name", "Unknown") for position, type_id in enumerate(type_ids)}
+    trips = [
+        Trip(
+            items=[
+                HaulItem(
+                    type_id=type_ids[position],
+                    name=names[position],
+                    quantity=quantity,
+                    volume=quantity * volumes[position],
+                    mass=quantity * masses[position],
+                )
+                for position, quantity in load
+            ],
+            volume=sum(quantity * volumes[position] for position, quantity in load),
+            mass=sum(quantity * masses[position] for position, quantity in load),
+        )
+        for load in loads
+    ]
+    return HaulingPlan(
+        trips=trips,
+        total_volume=sum(trip.volume for trip in trips),
+        total_mass=sum(trip.mass for trip in trips),
+    )
@@ -0,0 +1,113 @@
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import Engine, event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# set by serve.py so the workers write their metrics to files the /metrics endpoint of any worker can read
+MULTIPROCESS_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+UNMATCHED_ROUTE = "unmatched"
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency", ["method", "route", "status"])
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries run by one request", ["route"], buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100, 250),
+)
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Time one request spent in database queries", ["route"])
+DB_QUERY_SECONDS = Histogram("db_query_duration_seconds", "Database query latency")
+CACHE_LOOKUPS = Counter("cache_lookups", "Cache lookups by cache and result", ["cache", "result"])
+CATALOG_LOAD_SECONDS = Histogram(
+    "catalog_load_seconds", "Time to load the catalog, from the snapshot or by building it", ["source"], buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+CATALOG_WARM_SECONDS = Histogram("catalog_warm_seconds", "Time to build the search index and raw material table of a catalog")
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+
+
+# database work of the request being handled, shared with the greenlets the async engine runs queries in
+request_queries: ContextVar[QueryStats | None] = ContextVar("request_queries", default=None)
+
+
+def record_cache_lookup(cache: str, *, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def track_queries(engine: Engine) -> None:
+    """
+    Time every query run on the engine, pass the sync_engine of an async engine.
+    """
+
+    def before_cursor_execute(connection: Any, *_: Any) -> None:  # noqa: ANN401
+        connection.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(connection: Any, *_: Any) -> None:  # noqa: ANN401
+        elapsed = time.perf_counter() - connection.info["query_start"].pop()
+        DB_QUERY_SECONDS.observe(elapsed)
+        stats = request_queries.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+def metrics_response() -> tuple[bytes, str]:
+    """
+    Return the metrics in the Prometheus text format and its content type, merged across workers when there are several.
+    """
+    registry = REGISTRY
+    if os.environ.get(MULTIPROCESS_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, status and database work of every HTTP request, labelled by route template.
+    Requests that don't match a route share one label so unknown paths can't create new series.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = QueryStats()
+        token = request_queries.set(stats)
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_queries.reset(token)
+            route = scope["route"].path if "route" in scope else UNMATCHED_ROUTE
+            REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
+            REQUEST_DB_QUERIES.labels(route).observe(stats.count)
+            REQUEST_DB_SECONDS.labels(route).observe(stats.seconds)
@@ -1,5 +1,10 @@
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
+from bom import Strategy
+from solver import Objective
+
 
 class Material(BaseModel):
     quantity: int
@@ -15,3 +20,127 @@ class FrontierBlueprint(BaseModel):
     max_production: int
     product_count: int
     product_name: str
+
+
+class RawMaterial(BaseModel):
+    type_id: int
+    name: str
+    quantity: float
+
+
+class UsedIn(BaseModel):
+    bp_id: int
+    product_id: int
+    product_name: str
+    material_id: int
+    quantity: int
+
+
+class PlanTarget(BaseModel):
+    item_id: int
+    quantity: int = Field(gt=0)
+    blueprint_id: int | None = None
+
+
+class PlanRequest(BaseModel):
+    targets: list[PlanTarget]
+    strategy: Strategy = "min"
+    # picks every blueprint to minimize the objective instead of using the strategy
+    objective: Objective | None = None
+    # only use blueprints made in these structures
+    owned_structures: list[str] | None = None
+
+
+class PlanStep(BaseModel):
+    item_id: int
+    name: str
+    blueprint_id: int
+    runs: int
+    needed_quantity: int
+    produced_quantity: int
+    time: int
+    structures: list[str]
+
+
+class Plan(BaseModel):
+    steps: list[PlanStep]
+    raw_materials: list[RawMaterial]
+    total_time: int
+    structures: list[str]
+
+
+class PlanHaulingRequest(PlanRequest):
+    cargo_capacity: float = Field(gt=0)
+    mass_limit: float | None = Field(default=None, gt=0)
+
+
+class HaulItem(BaseModel):
+    type_id: int
+    name: str
+    quantity: int
+    volume: float
+    mass: float
+
+
+class Trip(BaseModel):
+    items: list[HaulItem]
+    volume: float
+    mass: float
+
+
+class HaulingPlan(BaseModel):
+    trips: list[Trip]
+    total_volume: float
+    total_mass: float
+
+
+class IngredientUpdate(BaseModel):
+    target_id: int
+    ingredient_id: int
+    delta: int
+
+
+class InventoryItem(BaseModel):
+    item_id: int
+    quantity: int = Field(gt=0)
+
+
+class InventoryLevel(BaseModel):
+    item_id: int
+    # 0 removes the item from the inventory
+    quantity: int = Field(ge=0)
+
+
+class RemainingNeed(BaseModel):
+    item_id: int
+    name: str
+    needed: int
+    on_hand: int
+    remaining: int
+    # crafting runs still to do, 0 for raw materials
+    runs: int
+
+
+class TargetsQuery(BaseModel):
+    """
+    Paging and field selection for the targets of a session, fields is a comma separated list.
+    """
+
+    fields: str | None = None
+    summary: bool = False
+    after: int | None = None
+    limit: int | None = Field(default=None, ge=1, le=1000)
+
+
+class SessionRecord(BaseModel):
+    """
+    One line of a session export, target_id refers to the target in the exporting database.
+    """
+
+    record: Literal["target", "ingredient", "inventory"]
+    target_id: int | None = None
+    item_id: int
+    blueprint_id: int | None = None
+    needed_quantity: int = Field(default=0, ge=0)
+    crafted_quantity: int = Field(default=0, ge=0)
+    quantity: int = Field(default=0, ge=0)
@@ -0,0 +1,152 @@
+import heapq
+import math
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from bom import CycleError, RawMaterialTable, Strategy
+from catalog import Catalog
+from models import Plan, PlanStep, PlanTarget, RawMaterial
+from solver import BlueprintSolver, Objective
+
+
+class PlanError(ValueError):
+    """
+    Raised when the plan targets can't be planned as requested.
+    """
+
+
+def target_blueprints(catalog: Catalog, targets: list[PlanTarget]) -> dict[int, int]:
+    """
+    Collect the blueprints requested for target items, a blueprint applies to the item wherever it is in the plan.
+    """
+    blueprint_choice: dict[int, int] = {}
+    for target in targets:
+        if target.blueprint_id is None:
+            continue
+        if catalog.blueprints.blueprint(target.item_id, target.blueprint_id) is None:
+            msg = f"Blueprint {target.blueprint_id} does not produce item {target.item_id}"
+            raise PlanError(msg)
+        if blueprint_choice.setdefault(target.item_id, target.blueprint_id) != target.blueprint_id:
+            msg = f"Conflicting blueprints requested for item {target.item_id}"
+            raise PlanError(msg)
+    return blueprint_choice
+
+
+def blueprint_table(
+    catalog: Catalog, strategy: Strategy, objective: Objective | None, owned_structures: list[str] | None,
+) -> RawMaterialTable | BlueprintSolver:
+    if objective is None and owned_structures is None:
+        return catalog.bom(strategy)
+    return catalog.solver(objective or "raw", owned_structures)
+
+
+@dataclass
+class PlanExpansion:
+    """
+    The demand for every item of a plan and the blueprint runs crafting it, before any record is built.
+    """
+
+    demand: dict[int, int]
+    # (item_id, blueprint_id, runs) in the order the items were expanded, final products first
+    runs: list[tuple[int, int, int]]
+
+
+def expand_plan(
+    catalog: Catalog,
+    targets: list[PlanTarget],
+    strategy: Strategy = "min",
+    objective: Objective | None = None,
+    owned_structures: list[str] | None = None,
+) -> PlanExpansion:
+    """
+    Merge the targets into a single multi-level expansion.
+
+    Demand for every item is accumulated across all targets before the item is expanded, so shared
+    intermediates are crafted once in whole product_count batches. Items are expanded in reverse
+    topological order from a heap, which only visits the items the plan actually needs.
+
+    Blueprints are picked by strategy, or by the solver when an objective or owned structures are given.
+    """
+    table = blueprint_table(catalog, strategy, objective, owned_structures)
+    demand: dict[int, int] = {}
+    blueprint_choice = target_blueprints(catalog, targets)
+    pending: list[tuple[int, int]] = []
+
+    def add_demand(item_id: int, quantity: int) -> None:
+        if item_id not in demand:
+            demand[item_id] = 0
+            if item_id in catalog.blueprints:
+                if item_id in table.cyclic:
+                    raise CycleError(item_id)
+                heapq.heappush(pending, (-table.position[item_id], item_id))
+        demand[item_id] += quantity
+
+    for target in targets:
+        add_demand(target.item_id, target.quantity)
+
+    runs = []
+    while pending:
+        _, item_id = heapq.heappop(pending)
+        if item_id not in blueprint_choice and item_id not in table.choice:
+            msg = f"Item {item_id} can't be built in the owned structures"
+            raise PlanError(msg)
+        bp_id = blueprint_choice.get(item_id, table.choice[item_id])
+        bp = catalog.blueprints.blueprint(item_id, bp_id)
+        if bp is None:
+            msg = f"Blueprint {bp_id} does not produce item {item_id}"
+            raise PlanError(msg)
+
+        item_runs = math.ceil(demand[item_id] / bp.product_count)
+        for material_id, material_quantity in bp.material_pairs():
+            add_demand(material_id, material_quantity * item_runs)
+        runs.append((item_id, bp_id, item_runs))
+    return PlanExpansion(demand=demand, runs=runs)
+
+
+def plan_steps(catalog: Catalog, expansion: PlanExpansion) -> Iterator[PlanStep]:
+    """
+    Yield the crafting steps of an expansion one at a time, from the materials up to the final products.
+    """
+    for item_id, bp_id, runs in reversed(expansion.runs):
+        bp = catalog.blueprints.blueprint(item_id, bp_id)
+        if bp is None:  # checked by expand_plan
+            continue
+        yield PlanStep(
+            item_id=item_id,
+            name=bp.product_name,
+            blueprint_id=bp_id,
+            runs=runs,
+            needed_quantity=expansion.demand[item_id],
+            produced_quantity=runs * bp.product_count,
+            time=bp.time * runs,
+            structures=list(bp.structures),
+        )
+
+
+def plan_raw_materials(catalog: Catalog, expansion: PlanExpansion) -> Iterator[RawMaterial]:
+    """
+    Yield the raw materials of an expansion one at a time, by item ID.
+    """
+    for item_id, quantity in sorted(expansion.demand.items()):
+        if item_id not in catalog.blueprints:
+            yield RawMaterial(type_id=item_id, name=catalog.item_types.get(item_id, {}).get("name", "Unknown"), quantity=quantity)
+
+
+def build_plan(
+    catalog: Catalog,
+    targets: list[PlanTarget],
+    strategy: Strategy = "min",
+    objective: Objective | None = None,
+    owned_structures: list[str] | None = None,
+) -> Plan:
+    """
+    Merge the targets into a single multi-level build plan, see expand_plan.
+    """
+    expansion = expand_plan(catalog, targets, strategy, objective, owned_structures)
+    steps = list(plan_steps(catalog, expansion))
+    return Plan(
+        steps=steps,
+        raw_materials=list(plan_raw_materials(catalog, expansion)),
+        total_time=sum(step.time for step in steps),
+        structures=sorted({structure for step in steps for structure in step.structures}),
+    )
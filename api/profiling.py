@@ -0,0 +1,109 @@
+import asyncio
+import functools
+import os
+import re
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any
+
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+    from pyinstrument.session import Session
+
+    HAS_PYINSTRUMENT = True
+except ImportError:  # installed with the profiling extra
+    HAS_PYINSTRUMENT = False
+
+# requests slower than this many milliseconds get a flamegraph written to PROFILE_DIR, unset disables profiling
+PROFILE_SLOW_MS = float(os.environ["CRAFTER_PROFILE_SLOW_MS"]) if os.environ.get("CRAFTER_PROFILE_SLOW_MS") else None
+PROFILE_DIR = os.environ.get("CRAFTER_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = 0.001
+
+# profiles of the sync endpoints run for the current request, None while the request isn't being profiled
+_thread_sessions: ContextVar[list["Session"] | None] = ContextVar("thread_sessions", default=None)
+
+
+def profile_in_thread(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap a sync endpoint to profile the threadpool thread running it while its request is profiled.
+    """
+
+    @functools.wraps(endpoint)
+    def profiled(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+        sessions = _thread_sessions.get()
+        if sessions is None:
+            return endpoint(*args, **kwargs)
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="disabled")
+        profiler.start()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            sessions.append(profiler.stop())
+
+    return profiled
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Route class whose sync endpoints are sampled in their own thread, used with SlowRequestProfiler.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:  # noqa: ANN401
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = profile_in_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class SlowRequestProfiler:
+    """
+    Sample every HTTP request with pyinstrument and keep the profile of the slow ones.
+
+    Profiles are written as speedscope files named after the route, open them on https://www.speedscope.app
+    to get a flamegraph. Sampling adds overhead to every request, so this is only enabled on demand.
+
+    pyinstrument only samples the thread it was started in, which is the event loop here. Sync endpoints run in
+    the threadpool, so their routes need the ProfiledRoute class to be sampled where they run, their samples are
+    merged into the request's profile.
+    """
+
+    def __init__(self, app: ASGIApp, slow_ms: float, directory: str = PROFILE_DIR) -> None:
+        if not HAS_PYINSTRUMENT:
+            msg = "Profiling slow requests needs pyinstrument, install the profiling extra"
+            raise RuntimeError(msg)
+        self.app = app
+        self.slow_ms = slow_ms
+        self.directory = Path(directory)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+        thread_sessions: list[Session] = []
+        token = _thread_sessions.set(thread_sessions)
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session = profiler.stop()
+            _thread_sessions.reset(token)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms >= self.slow_ms:
+                session = functools.reduce(Session.combine, thread_sessions, session)
+                route = scope["route"].path if "route" in scope else scope["path"]
+                await asyncio.to_thread(self.write_profile, session, f"{scope['method']} {route}", elapsed_ms)
+
+    def write_profile(self, session: "Session", request: str, elapsed_ms: float) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", request).strip("_")
+        path = self.directory / f"{time.strftime('%Y%m%dT%H%M%S')}-{slug}-{elapsed_ms:.0f}ms.speedscope.json"
+        path.write_text(SpeedscopeRenderer().render(session))
+        return path
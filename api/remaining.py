@@ -0,0 +1,108 @@
+import heapq
+import math
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from catalog import Catalog
+from models import RemainingNeed
+
+# sessions whose expanded needs are kept in memory, the least recently read is dropped first
+REMAINING_CACHE_SIZE = 1024
+
+
+class RemainingNeeds:
+    """
+    What a session still has to gather and craft, expanded down the recipe tree and netted against its inventory.
+
+    Demand is the quantity of each ingredient the targets still need. Items on hand are taken off the demand for
+    that item before it is expanded, so a stocked intermediate also removes the need for its materials. update()
+    only walks the items whose demand or inventory changed and the materials below them whose runs changed, in
+    reverse topological order, instead of expanding the whole tree again.
+    """
+
+    def __init__(self, catalog: Catalog) -> None:
+        self.catalog = catalog
+        self.table = catalog.bom()
+        self.demand: dict[int, int] = {}
+        self.inventory: dict[int, int] = {}
+        # demand from the targets plus the materials of the runs of every item above it
+        self.gross: dict[int, int] = {}
+        self.runs: dict[int, int] = {}
+
+    def update(self, demand: Mapping[int, int], inventory: Mapping[int, int]) -> None:
+        """
+        Bring the needs in line with the current demand and inventory of the session.
+        """
+        changed = set()
+        for item_id in demand.keys() | self.demand.keys():
+            delta = demand.get(item_id, 0) - self.demand.get(item_id, 0)
+            if delta:
+                self.gross[item_id] = self.gross.get(item_id, 0) + delta
+                changed.add(item_id)
+        for item_id in inventory.keys() | self.inventory.keys():
+            if inventory.get(item_id, 0) != self.inventory.get(item_id, 0):
+                changed.add(item_id)
+        self.demand = dict(demand)
+        self.inventory = dict(inventory)
+        self._propagate(changed)
+
+    def _propagate(self, changed: set[int]) -> None:
+        choice, position = self.table.choice, self.table.position
+        pending = [(-position[item_id], item_id) for item_id in changed if item_id in choice]
+        heapq.heapify(pending)
+        while pending:
+            # every item above this one has been settled, so its gross demand is final
+            _, item_id = heapq.heappop(pending)
+            bp = self.catalog.blueprints.blueprint(item_id, choice[item_id])
+            if bp is None:
+                continue
+            runs = math.ceil(max(self.gross.get(item_id, 0) - self.inventory.get(item_id, 0), 0) / (bp.product_count or 1))
+            delta = runs - self.runs.get(item_id, 0)
+            if not delta:
+                continue
+            self.runs[item_id] = runs
+            for material_id, material_quantity in bp.material_pairs():
+                self.gross[material_id] = self.gross.get(material_id, 0) + material_quantity * delta
+                if material_id in choice and material_id not in changed:
+                    changed.add(material_id)
+                    heapq.heappush(pending, (-position[material_id], material_id))
+
+    def needs(self) -> list[RemainingNeed]:
+        """
+        Return every item still needed, intermediates and raw materials, by item ID.
+        """
+        result = []
+        for item_id, needed in sorted(self.gross.items()):
+            on_hand = self.inventory.get(item_id, 0)
+            if needed > on_hand:
+                result.append(
+                    RemainingNeed(
+                        item_id=item_id,
+                        name=self.catalog.item_types.get(item_id, {}).get("name", "Unknown"),
+                        needed=needed,
+                        on_hand=on_hand,
+                        remaining=needed - on_hand,
+                        runs=self.runs.get(item_id, 0),
+                    ),
+                )
+        return result
+
+
+_remaining: OrderedDict[uuid.UUID, RemainingNeeds] = OrderedDict()
+
+
+def remaining_needs(catalog: Catalog, session_uuid: uuid.UUID, demand: Mapping[int, int], inventory: Mapping[int, int]) -> RemainingNeeds:
+    """
+    Return the session's needs updated to the demand and inventory, reusing the expansion from the last read.
+
+    The inputs are read from the database on every call, so changes made through other workers are picked up too.
+    """
+    needs = _remaining.pop(session_uuid, None)
+    if needs is None or needs.catalog is not catalog:
+        needs = RemainingNeeds(catalog)
+    needs.update(demand, inventory)
+    _remaining[session_uuid] = needs
+    if len(_remaining) > REMAINING_CACHE_SIZE:
+        _remaining.popitem(last=False)
+    return needs
@@ -0,0 +1,535 @@
+import asyncio
+import uuid
+from collections.abc import AsyncIterator, Callable, Sequence
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import ColumnElement, Float, cast, delete, func, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.sql.dml import ReturningUpdate
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import Select, SelectOfScalar
+
+from cache import session_reads
+from catalog import get_catalog
+from events import broker, session_channel
+from models import IngredientUpdate, SessionRecord
+from schema import CraftingIngredient, CraftingSession, CraftingTarget, SessionInventory
+from transfer import SessionImportError
+
+if TYPE_CHECKING:
+    from sqlalchemy.sql.elements import Label
+
+
+# insert constructs with ON CONFLICT DO UPDATE, for the database backends the API supports
+UPSERT_INSERTS: dict[str, Callable[..., sqlite.Insert | postgresql.Insert]] = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+class IngredientNotFoundError(LookupError):
+    """
+    Raised when a batch update refers to an ingredient that isn't part of the session.
+    """
+
+    def __init__(self, target_id: int, ingredient_id: int) -> None:
+        super().__init__(f"Ingredient {ingredient_id} of target {target_id} not found")
+        self.target_id = target_id
+        self.ingredient_id = ingredient_id
+
+
+async def create_session(db: AsyncSession) -> uuid.UUID:
+    new_crafting_session = CraftingSession()
+    db.add(new_crafting_session)
+    await db.commit()
+    return new_crafting_session.session_uuid
+
+
+async def get_session(db: AsyncSession, session_uuid: uuid.UUID) -> CraftingSession | None:
+    query = select(CraftingSession).where(CraftingSession.session_uuid == session_uuid)
+    return (await db.exec(query)).first()
+
+
+async def get_session_id(db: AsyncSession, session_uuid: uuid.UUID) -> int | None:
+    return (await db.exec(select(CraftingSession.id).where(CraftingSession.session_uuid == session_uuid))).first()
+
+
+# fields of a target that can be selected, the summary fields are aggregated over its ingredients in SQL
+TARGET_FIELDS = ("id", "item_id", "needed_quantity", "blueprint_id", "crafted_quantity", "session_id")
+SUMMARY_FIELDS = ("ingredients_needed", "ingredients_crafted", "progress")
+# rows fetched per round trip when exporting and inserted per executemany when importing
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+
+
+def ingredient_totals() -> dict[str, ColumnElement[Any]]:
+    needed = func.coalesce(func.sum(col(CraftingIngredient.needed_quantity)), 0)
+    crafted = func.coalesce(func.sum(col(CraftingIngredient.crafted_quantity)), 0)
+    return {
+        "ingredients_needed": needed,
+        "ingredients_crafted": crafted,
+        # NULL for targets without ingredients rather than dividing by zero
+        "progress": cast(crafted, Float) / func.nullif(needed, 0),
+    }
+
+
+async def get_target_rows(
+    db: AsyncSession, session_uuid: uuid.UUID, fields: Sequence[str], after: int | None = None, limit: int | None = None,
+) -> list[dict[str, Any]] | None:
+    """
+    Return the requested fields of the session's targets as plain rows, ordered by ID.
+
+    Pages are keyed on the target ID: pass the last ID of a page as after to get the next one. The ID is always
+    included so the caller can page on. Summary fields join and sum the target's ingredients in the same query.
+    """
+    session_id = await get_session_id(db, session_uuid)
+    if session_id is None:
+        return None
+
+    totals = ingredient_totals()
+    columns: list[Label[Any]] = [col(CraftingTarget.id).label("id")]
+    columns += [
+        (totals[field] if field in totals else getattr(CraftingTarget, field)).label(field) for field in dict.fromkeys(fields) if field != "id"
+    ]
+    # sqlmodel's select() is only typed up to four columns
+    query: Select[Any] = Select(*columns).where(CraftingTarget.session_id == session_id)
+    if any(field in totals for field in fields):
+        query = query.outerjoin(CraftingIngredient).group_by(col(CraftingTarget.id))
+    if after is not None:
+        query = query.where(col(CraftingTarget.id) > after)
+    query = query.order_by(col(CraftingTarget.id))
+    if limit is not None:
+        query = query.limit(limit)
+    return [dict(row._mapping) for row in (await db.exec(query)).all()]  # noqa: SLF001
+
+
+async def get_session_summary(db: AsyncSession, session_uuid: uuid.UUID) -> dict[str, Any] | None:
+    """
+    Return the number of targets and the ingredient totals of the session, computed in SQL.
+    """
+    session_id = await get_session_id(db, session_uuid)
+    if session_id is None:
+        return None
+
+    totals = ingredient_totals()
+    query: Select[Any] = (
+        Select(func.count(func.distinct(col(CraftingTarget.id))).label("targets"), *(column.label(field) for field, column in totals.items()))
+        .select_from(CraftingTarget)
+        .outerjoin(CraftingIngredient)
+        .where(CraftingTarget.session_id == session_id)
+    )
+    return dict((await db.exec(query)).one()._mapping)  # noqa: SLF001
+
+
+async def add_target(db: AsyncSession, session_uuid: uuid.UUID, crafting_target: CraftingTarget) -> CraftingSession | None:
+    # Only the session row is needed to attach the target, not its targets and ingredients
+    crafting_session = await get_session(db, session_uuid)
+    if crafting_session is None:
+        return None
+
+    # Set the foreign key relationship
+    crafting_target.session_id = crafting_session.id
+
+    # fetch the blueprint for the target item and set the required ingredients
+    # kept in a local list, reading the relationship after the commit would lazy load it outside the async context
+    # the first call builds the catalog, which must not run on the event loop
+    catalog = await asyncio.to_thread(get_catalog)
+    bp = catalog.blueprints.blueprint(crafting_target.item_id, crafting_target.blueprint_id)
+    ingredients = [
+        CraftingIngredient(item_id=material_id, needed_quantity=material_quantity, crafted_quantity=0)
+        for material_id, material_quantity in (bp.material_pairs() if bp is not None else ())
+    ]
+    crafting_target.ingredients = ingredients
+
+    # Add the target to the session
+    db.add(crafting_target)
+    await db.commit()
+    await session_reads.invalidate(session_uuid)
+
+    await broker.publish(
+        session_channel(session_uuid),
+        {
+            "type": "target_added",
+            "target": crafting_target.model_dump(),
+            "ingredients": [ingredient.model_dump() for ingredient in ingredients],
+        },
+    )
+    return crafting_session
+
+
+def target_id_query(session_uuid: uuid.UUID, target_item_id: int) -> SelectOfScalar[int]:
+    """
+    Select the ID of the first target in the session crafting the item.
+    """
+    return (
+        select(CraftingTarget.id)
+        .join(CraftingSession)
+        .where(CraftingSession.session_uuid == session_uuid, CraftingTarget.item_id == target_item_id)
+        .order_by(col(CraftingTarget.id))
+        .limit(1)
+    )
+
+
+async def get_target_ingredients(db: AsyncSession, session_uuid: uuid.UUID, target_item_id: int) -> list[CraftingIngredient] | None:
+    target_id = (await db.exec(target_id_query(session_uuid, target_item_id))).first()
+    if target_id is None:
+        return None
+
+    query = select(CraftingIngredient).where(CraftingIngredient.target_id == target_id).order_by(col(CraftingIngredient.id))
+    return list((await db.exec(query)).all())
+
+
+async def get_remaining_ingredients(db: AsyncSession, session_uuid: uuid.UUID) -> dict[int, int] | None:
+    """
+    Return how many of each ingredient the session still needs, summed over all its targets.
+    """
+    session_id = await get_session_id(db, session_uuid)
+    if session_id is None:
+        return None
+
+    remaining = func.sum(col(CraftingIngredient.needed_quantity) - col(CraftingIngredient.crafted_quantity))
+    query = (
+        select(CraftingIngredient.item_id, remaining)
+        .join(CraftingTarget)
+        .where(CraftingTarget.session_id == session_id, col(CraftingIngredient.crafted_quantity) < col(CraftingIngredient.needed_quantity))
+        .group_by(col(CraftingIngredient.item_id))
+    )
+    return dict((await db.exec(query)).all())
+
+
+async def get_inventory(db: AsyncSession, session_uuid: uuid.UUID) -> dict[int, int] | None:
+    session_id = await get_session_id(db, session_uuid)
+    if session_id is None:
+        return None
+
+    query = select(SessionInventory.item_id, SessionInventory.quantity).where(SessionInventory.session_id == session_id)
+    return dict((await db.exec(query)).all())
+
+
+async def set_inventory(db: AsyncSession, session_uuid: uuid.UUID, items: dict[int, int]) -> dict[int, int] | None:
+    """
+    Set how many of each item the session has on hand, a quantity of 0 removes the item. Returns the whole inventory.
+    """
+    session_id = await get_session_id(db, session_uuid)
+    if session_id is None:
+        return None
+
+    removed = [item_id for item_id, quantity in items.items() if quantity <= 0]
+    if removed:
+        await db.exec(  # type: ignore[call-overload]
+            delete(SessionInventory).where(col(SessionInventory.session_id) == session_id, col(SessionInventory.item_id).in_(removed)),
+        )
+    levels = [{"session_id": session_id, "item_id": item_id, "quantity": quantity} for item_id, quantity in items.items() if quantity > 0]
+    if levels:
+        # an upsert rather than delete and insert, concurrent updates of the same item would both insert it
+        statement = UPSERT_INSERTS[db.get_bind().dialect.name](SessionInventory)
+        statement = statement.on_conflict_do_update(
+            index_elements=[col(SessionInventory.session_id), col(SessionInventory.item_id)], set_={"quantity": statement.excluded.quantity},
+        )
+        await db.exec(statement, params=levels)  # type: ignore[call-overload]
+    await db.commit()
+    await session_reads.invalidate(session_uuid)
+
+    await broker.publish(
+        session_channel(session_uuid),
+        {"type": "inventory_updated", "items": [{"item_id": item_id, "quantity": quantity} for item_id, quantity in items.items()]},
+    )
+    return await get_inventory(db, session_uuid)
+
+
+async def stream_session_records(db: AsyncSession, session_id: int) -> AsyncIterator[dict[str, Any]]:
+    """
+    Yield the targets, ingredients and inventory of a session as export records, fetched in batches.
+
+    The records are read in a session of their own on the same database, so they can still be streamed after
+    the request's session is closed.
+    """
+    async with AsyncSession(db.bind) as stream_db:
+        targets: Select[Any] = Select(
+            col(CraftingTarget.id).label("target_id"),
+            col(CraftingTarget.item_id),
+            col(CraftingTarget.blueprint_id),
+            col(CraftingTarget.needed_quantity),
+            col(CraftingTarget.crafted_quantity),
+        ).where(CraftingTarget.session_id == session_id)
+        ingredients: Select[Any] = (
+            Select(
+                col(CraftingIngredient.target_id),
+                col(CraftingIngredient.item_id),
+                col(CraftingIngredient.needed_quantity),
+                col(CraftingIngredient.crafted_quantity),
+            )
+            .join(CraftingTarget)
+            .where(CraftingTarget.session_id == session_id)
+        )
+        for record, query in (("target", targets.order_by(col(CraftingTarget.id))), ("ingredient", ingredients.order_by(col(CraftingIngredient.id)))):
+            # plain rows rather than models, nothing is kept in the session while streaming
+            async for row in await stream_db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+                yield {"record": record, **row._mapping}  # noqa: SLF001
+
+        inventory = select(SessionInventory.item_id, SessionInventory.quantity).where(SessionInventory.session_id == session_id)
+        for item_id, quantity in (await stream_db.exec(inventory.order_by(col(SessionInventory.item_id)))).all():
+            yield {"record": "inventory", "item_id": item_id, "quantity": quantity}
+
+
+class SessionImporter:
+    """
+    Insert the records of a session export into a new session, batched into one executemany per table.
+
+    An ingredient must come after its target, as in an export. Ingredients keep the exported target ID until
+    their batch is inserted, pending targets are inserted first so they can be mapped to the new IDs.
+    """
+
+    def __init__(self, db: AsyncSession, session_id: int) -> None:
+        self.db = db
+        self.session_id = session_id
+        # target IDs of the export mapped to the inserted targets
+        self.target_ids: dict[int, int] = {}
+        self.pending_target_ids: set[int] = set()
+        self.targets: list[SessionRecord] = []
+        self.ingredients: list[dict[str, int]] = []
+        self.inventory: dict[int, int] = {}
+        self.counts = {"targets": 0, "ingredients": 0, "inventory": 0}
+
+    async def add(self, record: SessionRecord) -> None:
+        if record.record == "target":
+            self.add_target(record)
+            if len(self.targets) >= IMPORT_BATCH_SIZE:
+                await self.insert_targets()
+        elif record.record == "ingredient":
+            self.add_ingredient(record)
+            if len(self.ingredients) >= IMPORT_BATCH_SIZE:
+                await self.insert_ingredients()
+        else:
+            self.inventory[record.item_id] = self.inventory.get(record.item_id, 0) + record.quantity
+
+    def add_target(self, record: SessionRecord) -> None:
+        if record.blueprint_id is None:
+            msg = f"Target for item {record.item_id} has no blueprint_id"
+            raise SessionImportError(msg)
+        if record.target_id is not None:
+            if record.target_id in self.target_ids or record.target_id in self.pending_target_ids:
+                msg = f"Target {record.target_id} appears more than once"
+                raise SessionImportError(msg)
+            self.pending_target_ids.add(record.target_id)
+        self.targets.append(record)
+
+    def add_ingredient(self, record: SessionRecord) -> None:
+        if record.target_id is None or (record.target_id not in self.target_ids and record.target_id not in self.pending_target_ids):
+            msg = f"Ingredient {record.item_id} refers to target {record.target_id}, which doesn't come before it"
+            raise SessionImportError(msg)
+        # the export's target ID, replaced by the new one when the batch is inserted
+        self.ingredients.append(
+            {
+                "target_id": record.target_id,
+                "item_id": record.item_id,
+                "needed_quantity": record.needed_quantity,
+                "crafted_quantity": record.crafted_quantity,
+            },
+        )
+
+    async def insert_targets(self) -> None:
+        if not self.targets:
+            return
+        statement = insert(CraftingTarget).returning(col(CraftingTarget.id), sort_by_parameter_order=True)
+        rows = [
+            {
+                "session_id": self.session_id,
+                "item_id": target.item_id,
+                "blueprint_id": target.blueprint_id,
+                "needed_quantity": target.needed_quantity,
+                "crafted_quantity": target.crafted_quantity,
+            }
+            for target in self.targets
+        ]
+        new_ids = (await self.db.exec(statement, params=rows)).scalars().all()  # type: ignore[call-overload]
+        for target, new_id in zip(self.targets, new_ids, strict=True):
+            if target.target_id is not None:
+                self.target_ids[target.target_id] = new_id
+        self.counts["targets"] += len(self.targets)
+        self.targets.clear()
+        self.pending_target_ids.clear()
+
+    async def insert_ingredients(self) -> None:
+        if self.ingredients:
+            # targets still pending need their new IDs first
+            await self.insert_targets()
+            for ingredient in self.ingredients:
+                ingredient["target_id"] = self.target_ids[ingredient["target_id"]]
+            await self.db.exec(insert(CraftingIngredient), params=self.ingredients)  # type: ignore[call-overload]
+            self.counts["ingredients"] += len(self.ingredients)
+            self.ingredients.clear()
+
+    async def finish(self) -> dict[str, int]:
+        await self.insert_ingredients()
+        await self.insert_targets()
+        stocked = {item_id: quantity for item_id, quantity in self.inventory.items() if quantity > 0}
+        self.db.add_all(SessionInventory(session_id=self.session_id, item_id=item_id, quantity=quantity) for item_id, quantity in stocked.items())
+        self.counts["inventory"] = len(stocked)
+        return self.counts
+
+
+async def import_session(db: AsyncSession, records: AsyncIterator[SessionRecord]) -> tuple[uuid.UUID, dict[str, int]]:
+    """
+    Create a new session from export records in one transaction, return its UUID and the number of rows created.
+    Nothing is kept if any record is invalid.
+    """
+    crafting_session = CraftingSession()
+    db.add(crafting_session)
+    await db.flush()
+
+    importer = SessionImporter(db, crafting_session.id)
+    try:
+        async for record in records:
+            await importer.add(record)
+        counts = await importer.finish()
+    except SessionImportError:
+        await db.rollback()
+        raise
+    await db.commit()
+    return crafting_session.session_uuid, counts
+
+
+async def modify_ingredient_quantity(
+    db: AsyncSession, session_uuid: uuid.UUID, target_id: int, ingredient_id: int, quantity: int,
+) -> CraftingIngredient | None:
+    """
+    Atomically add quantity to an ingredient's crafted quantity and return the updated ingredient.
+    The increment happens in SQL so concurrent updates to the same ingredient are never lost.
+    """
+    statement = increment_ingredient(
+        [
+            col(CraftingIngredient.target_id) == target_id_query(session_uuid, target_id).scalar_subquery(),
+            col(CraftingIngredient.item_id) == ingredient_id,
+        ],
+        quantity,
+    )
+    ingredient = (await db.exec(statement)).scalars().first()  # type: ignore[call-overload]
+    await db.commit()
+    await session_reads.invalidate(session_uuid)
+
+    if ingredient is not None:
+        await broker.publish(
+            session_channel(session_uuid),
+            {
+                "type": "ingredient_updated",
+                "target_id": target_id,
+                "ingredient_id": ingredient_id,
+                "crafted_quantity": ingredient.crafted_quantity,
+            },
+        )
+    return ingredient
+
+
+def increment_ingredient(ingredient_filter: list[ColumnElement[bool]], quantity: int) -> ReturningUpdate[tuple[CraftingIngredient]]:
+    return (
+        update(CraftingIngredient)
+        .where(*ingredient_filter)
+        .values(crafted_quantity=col(CraftingIngredient.crafted_quantity) + quantity)
+        .returning(CraftingIngredient)
+    )
+
+
+async def publish_ingredient_updates(session_uuid: uuid.UUID, updated: list[tuple[int, CraftingIngredient]]) -> None:
+    """
+    Publish one combined delta for ingredients changed in a single transaction.
+    """
+    await broker.publish(
+        session_channel(session_uuid),
+        {
+            "type": "ingredients_updated",
+            "ingredients": [
+                {"target_id": target_item_id, "ingredient_id": ingredient.item_id, "crafted_quantity": ingredient.crafted_quantity}
+                for target_item_id, ingredient in updated
+            ],
+        },
+    )
+
+
+async def modify_ingredient_quantities(
+    db: AsyncSession, session_uuid: uuid.UUID, updates: list[IngredientUpdate],
+) -> list[CraftingIngredient] | None:
+    """
+    Apply many ingredient increments in one transaction, either all of them are applied or none.
+    """
+    session_id = await get_session_id(db, session_uuid)
+    if session_id is None:
+        return None
+
+    # map the target item IDs used by the API to the first target row for each item, like target_id_query
+    targets = await db.exec(
+        select(CraftingTarget.item_id, CraftingTarget.id).where(CraftingTarget.session_id == session_id).order_by(col(CraftingTarget.id)),
+    )
+    target_ids: dict[int, int] = {}
+    for item_id, target_id in targets:
+        target_ids.setdefault(item_id, target_id)
+
+    updated: dict[int, tuple[int, CraftingIngredient]] = {}
+    for ingredient_update in updates:
+        ingredient = None
+        if ingredient_update.target_id in target_ids:
+            statement = increment_ingredient(
+                [
+                    col(CraftingIngredient.target_id) == target_ids[ingredient_update.target_id],
+                    col(CraftingIngredient.item_id) == ingredient_update.ingredient_id,
+                ],
+                ingredient_update.delta,
+            )
+            ingredient = (await db.exec(statement)).scalars().first()  # type: ignore[call-overload]
+        if ingredient is None:
+            await db.rollback()
+            raise IngredientNotFoundError(ingredient_update.target_id, ingredient_update.ingredient_id)
+        updated[ingredient.id] = (ingredient_update.target_id, ingredient)
+    await db.commit()
+    await session_reads.invalidate(session_uuid)
+
+    await publish_ingredient_updates(session_uuid, list(updated.values()))
+    return [ingredient for _, ingredient in updated.values()]
+
+
+async def distribute_ingredients(
+    db: AsyncSession, session_uuid: uuid.UUID, items: dict[int, int],
+) -> tuple[list[CraftingIngredient], dict[int, int]] | None:
+    """
+    Spread an inventory dump over every ingredient in the session that still needs those items, oldest target first.
+    Returns the updated ingredients and the quantity of each item that wasn't needed anywhere.
+    """
+    session_id = await get_session_id(db, session_uuid)
+    if session_id is None:
+        return None
+
+    query = (
+        select(CraftingIngredient, CraftingTarget.item_id)
+        .join(CraftingTarget)
+        .where(
+            CraftingTarget.session_id == session_id,
+            col(CraftingIngredient.item_id).in_(items),
+            col(CraftingIngredient.crafted_quantity) < col(CraftingIngredient.needed_quantity),
+        )
+        .order_by(col(CraftingTarget.id), col(CraftingIngredient.id))
+        # keeps concurrent distributions from splitting the same remaining quantity, where the database supports it
+        .with_for_update(of=CraftingIngredient)
+    )
+    leftover = dict(items)
+    updated = []
+    for ingredient, target_item_id in (await db.exec(query)).all():
+        while (amount := min(leftover[ingredient.item_id], ingredient.needed_quantity - ingredient.crafted_quantity)) > 0:
+            # increment in SQL rather than on the loaded row so concurrent contributions aren't lost, and only while
+            # it still fits, so the leftover counts exactly what wasn't applied
+            statement = increment_ingredient(
+                [
+                    col(CraftingIngredient.id) == ingredient.id,
+                    col(CraftingIngredient.crafted_quantity) + amount <= col(CraftingIngredient.needed_quantity),
+                ],
+                amount,
+            )
+            updated_ingredient = (await db.exec(statement)).scalars().one_or_none()  # type: ignore[call-overload]
+            if updated_ingredient is not None:
+                leftover[ingredient.item_id] -= amount
+                updated.append((target_item_id, updated_ingredient))
+                break
+            # another update landed since the row was read, fit what's left of the ingredient now
+            await db.refresh(ingredient)
+    await db.commit()
+    await session_reads.invalidate(session_uuid)
+
+    await publish_ingredient_updates(session_uuid, updated)
+    return [ingredient for _, ingredient in updated], leftover
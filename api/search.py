@@ -0,0 +1,83 @@
+from collections.abc import Iterable, Iterator, Mapping
+from itertools import chain, islice
+from typing import Any
+
+NGRAM_SIZE = 3
+
+
+def ngrams(text: str, size: int) -> set[str]:
+    """
+    Return every substring of the given size in the text.
+    """
+    return {text[i : i + size] for i in range(len(text) - size + 1)}
+
+
+class SearchIndex:
+    """
+    Precomputed item name index for ranked autocomplete.
+
+    Names are casefolded once and indexed by every substring up to NGRAM_SIZE characters, so short
+    queries are a single dictionary lookup and longer queries intersect the trigram posting lists.
+    Names are also indexed by their prefixes up to NGRAM_SIZE characters for prefix matches. Every list
+    is in rank order, so a search walks them lazily and stops once it has a page of results.
+    """
+
+    def __init__(self, item_types: Mapping[int, dict], craftable_ids: Iterable[int]) -> None:
+        # positions are assigned in (name length, name) order so posting lists are already ranked
+        entries = sorted(
+            ((item_id, item["name"]) for item_id, item in item_types.items() if item.get("name")),
+            key=lambda entry: (len(entry[1]), entry[1].casefold(), entry[0]),
+        )
+        self.ids = [item_id for item_id, _ in entries]
+        self.names = [name for _, name in entries]
+        self.folded = [name.casefold() for name in self.names]
+        craftable = set(craftable_ids)
+        self.craftable = [item_id in craftable for item_id in self.ids]
+
+        self.postings: dict[str, list[int]] = {}
+        self.prefixes: dict[str, list[int]] = {}
+        for position, folded in enumerate(self.folded):
+            for size in range(1, NGRAM_SIZE + 1):
+                for gram in ngrams(folded, size):
+                    self.postings.setdefault(gram, []).append(position)
+                if len(folded) >= size:
+                    self.prefixes.setdefault(folded[:size], []).append(position)
+
+    def _rarest_posting(self, query: str) -> list[int]:
+        return min((self.postings.get(gram, []) for gram in ngrams(query, NGRAM_SIZE)), key=len)
+
+    def _prefix_matches(self, query: str) -> Iterator[int]:
+        candidates = self.prefixes.get(query[:NGRAM_SIZE], [])
+        if len(query) <= NGRAM_SIZE:
+            return iter(candidates)
+        # a prefix match also contains every trigram of the query, walk whichever list is shorter
+        candidates = min(candidates, self._rarest_posting(query), key=len)
+        return (position for position in candidates if self.folded[position].startswith(query))
+
+    def _substring_matches(self, query: str) -> Iterator[int]:
+        candidates: Iterable[int]
+        if len(query) <= NGRAM_SIZE:
+            candidates = self.postings.get(query, [])
+        else:
+            # start from the rarest trigram and verify the remaining candidates directly
+            candidates = (position for position in self._rarest_posting(query) if query in self.folded[position])
+        # prefix matches were already returned ahead of the other substring matches
+        return (position for position in candidates if not self.folded[position].startswith(query))
+
+    def search(
+        self, item_name: str, limit: int | None = None, offset: int = 0, *, craftable_only: bool = False,
+    ) -> list[dict[str, Any]]:
+        """
+        Search item names ranked as exact matches, then prefix matches, then other substring matches.
+
+        Exact matches are the shortest prefix matches, so they come first in the prefix list's rank order.
+        """
+        query = item_name.casefold()
+        if not query:
+            return []
+
+        positions: Iterable[int] = chain(self._prefix_matches(query), self._substring_matches(query))
+        if craftable_only:
+            positions = (position for position in positions if self.craftable[position])
+        end = None if limit is None else offset + limit
+        return [{"name": self.names[position], "id": self.ids[position]} for position in islice(positions, offset, end)]
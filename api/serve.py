@@ -0,0 +1,53 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+
+import uvicorn
+
+from cache import SESSION_CACHE_TTL_ENV
+from catalog import SNAPSHOT_VERSION_ENV, load_catalog
+from ccp import refresh_types
+from metrics import MULTIPROCESS_DIR_ENV
+from schema import create_db_and_tables
+
+# tells api.py that the parent process refreshes the types cache, so workers don't all fetch it
+WORKER_MODE_ENV = "CRAFTER_WORKER_MODE"
+
+
+def main() -> None:
+    """
+    Run the API with several worker processes sharing one copy of the game data.
+
+    The snapshot is built or validated once here, the workers map the same snapshot file instead of compiling
+    the game data themselves.
+    """
+    parser = argparse.ArgumentParser(description="Run the frontier-crafter API with multiple workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    # create the tables up front, workers starting together would race to create them
+    asyncio.run(create_db_and_tables())
+    catalog = load_catalog()
+    print(f"Serving catalog version {catalog.version} with {args.workers} workers")
+    if args.workers > 1:
+        # the session broker is in-process, a socket only sees the changes handled by its own worker
+        print("Live session updates are only delivered within one worker, use --workers 1 if clients rely on them")
+
+    # workers inherit the environment, they check the snapshot against this version without hashing the sources
+    os.environ[SNAPSHOT_VERSION_ENV] = catalog.version
+    os.environ[WORKER_MODE_ENV] = "1"
+    # each worker writes its metrics to this directory so /metrics on any worker reports all of them
+    os.environ.setdefault(MULTIPROCESS_DIR_ENV, tempfile.mkdtemp(prefix="frontier-crafter-metrics-"))
+    # a write only invalidates the session cache of its own worker, keep what the others serve only briefly stale
+    os.environ.setdefault(SESSION_CACHE_TTL_ENV, "2")
+    threading.Thread(target=asyncio.run, args=(refresh_types(),), daemon=True).start()
+
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import math
+from collections.abc import Collection, Mapping, Sequence
+from typing import Literal
+
+from bom import CycleError, topological_order
+from store import Blueprint
+
+Objective = Literal["raw", "time", "structures"]
+
+
+class BlueprintSolver:
+    """
+    Pick the blueprint of every craftable item so its whole recipe tree minimizes an objective.
+
+    The recipe graph is walked once in topological order and every item keeps the cost of its best blueprint per
+    crafted unit, built from the costs already found for its materials:
+
+    - "raw": raw material units, like the "min" raw material table
+    - "time": build time of the item and everything below it
+    - "structures": number of distinct structures needed, ties broken on raw material units
+
+    The structure count isn't additive, so for that objective each item keeps the smallest set of structures of
+    its own subtree and the sets are merged on the way up, which is a close approximation rather than the exact
+    minimum for trees sharing intermediates. With owned_structures only blueprints made in one of those structures
+    are used, items that can't be built from them have no choice.
+    """
+
+    def __init__(
+        self,
+        blueprints: Mapping[int, Sequence[Blueprint]],
+        objective: Objective = "raw",
+        owned_structures: Collection[str] | None = None,
+    ) -> None:
+        self.blueprints = blueprints
+        self.objective = objective
+        self.owned_structures = None if owned_structures is None else frozenset(owned_structures)
+        self.cost: dict[int, float] = {}
+        self.raw_units: dict[int, float] = {}
+        self.structures: dict[int, frozenset[str]] = {}
+        self.choice: dict[int, int] = {}
+
+        order, self.cyclic = topological_order(blueprints)
+        self.position = {item_id: position for position, item_id in enumerate(order)}
+        for item_id in order:
+            self._select(item_id)
+
+    def _usable(self, bp: Blueprint) -> tuple[str, ...] | None:
+        """
+        Return the structures the blueprint can be made in, None when it can't be used.
+        """
+        if self.owned_structures is None:
+            return bp.structures
+        return tuple(structure for structure in bp.structures if structure in self.owned_structures) or None
+
+    def _select(self, item_id: int) -> None:
+        best: tuple[float, float] | None = None
+        for bp in self.blueprints[item_id]:
+            usable = self._usable(bp)
+            if usable is None:
+                continue
+            product_count = bp.product_count or 1
+            cost = bp.time / product_count if self.objective == "time" else 0.0
+            raw_units = 0.0
+            structures: set[str] = set()
+            for material_id, material_quantity in bp.material_pairs():
+                if material_id in self.blueprints and material_id not in self.choice:
+                    break  # the material can't be built, so neither can the item this way
+                per_unit = material_quantity / product_count
+                cost += per_unit * self.cost.get(material_id, 1.0 if self.objective == "raw" else 0.0)
+                raw_units += per_unit * self.raw_units.get(material_id, 1.0)
+                structures |= self.structures.get(material_id, frozenset())
+            else:
+                # a structure already needed below costs nothing extra
+                if usable and structures.isdisjoint(usable):
+                    structures.add(usable[0])
+                if self.objective == "structures":
+                    cost = len(structures)
+                if best is None or (cost, raw_units) < best:
+                    best = (cost, raw_units)
+                    self.cost[item_id], self.raw_units[item_id] = cost, raw_units
+                    self.structures[item_id] = frozenset(structures)
+                    self.choice[item_id] = bp.bp_id
+
+    def total(self, item_id: int, quantity: float = 1) -> float:
+        """
+        Return the objective value of crafting the quantity of the item, infinite when it can't be built.
+        """
+        if item_id in self.cyclic:
+            raise CycleError(item_id)
+        if item_id not in self.blueprints:
+            return quantity if self.objective == "raw" else 0.0
+        if item_id not in self.choice:
+            return math.inf
+        if self.objective == "structures":
+            return self.cost[item_id]
+        return self.cost[item_id] * quantity
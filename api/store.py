@@ -0,0 +1,322 @@
+import json
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterator, Mapping, Sequence
+from typing import Any, Final
+
+# signed 64 bit integers, type IDs and quantities don't fit in 32 bits everywhere
+INT_TYPECODE: Final = "q"
+FLOAT_TYPECODE: Final = "d"
+# the flat integer columns of a BlueprintStore, written to and mapped from the catalog snapshot as is
+STORE_ARRAYS = (
+    "product_ids",
+    "product_offsets",
+    "row_product_ids",
+    "row_bp_ids",
+    "row_product_counts",
+    "row_times",
+    "row_max_productions",
+    "row_structure_sets",
+    "material_offsets",
+    "material_ids",
+    "material_quantities",
+    "consumer_ids",
+    "consumer_offsets",
+    "consumer_rows",
+)
+
+
+class Material:
+    """
+    View of one material of a blueprint, reads straight from the store arrays.
+    """
+
+    __slots__ = ("_index", "_store")
+
+    def __init__(self, store: "BlueprintStore", index: int) -> None:
+        self._store = store
+        self._index = index
+
+    @property
+    def type_id(self) -> int:
+        return self._store.material_ids[self._index]
+
+    @property
+    def quantity(self) -> int:
+        return self._store.material_quantities[self._index]
+
+    @property
+    def name(self) -> str:
+        return self._store.name(self.type_id)
+
+
+class Blueprint:
+    """
+    View of one (blueprint, product) row of the store, nothing is copied until a field is read.
+    """
+
+    __slots__ = ("_row", "_store")
+
+    def __init__(self, store: "BlueprintStore", row: int) -> None:
+        self._store = store
+        self._row = row
+
+    @property
+    def bp_id(self) -> int:
+        return self._store.row_bp_ids[self._row]
+
+    @property
+    def product_id(self) -> int:
+        return self._store.row_product_ids[self._row]
+
+    @property
+    def product_count(self) -> int:
+        return self._store.row_product_counts[self._row]
+
+    @property
+    def time(self) -> int:
+        return self._store.row_times[self._row]
+
+    @property
+    def max_production(self) -> int:
+        return self._store.row_max_productions[self._row]
+
+    @property
+    def structures(self) -> tuple[str, ...]:
+        return self._store.structure_sets[self._store.row_structure_sets[self._row]]
+
+    @property
+    def product_name(self) -> str:
+        return self._store.name(self.product_id)
+
+    @property
+    def materials(self) -> list[Material]:
+        start, end = self._store.material_offsets[self._row], self._store.material_offsets[self._row + 1]
+        return [Material(self._store, index) for index in range(start, end)]
+
+    def material_pairs(self) -> Iterator[tuple[int, int]]:
+        """
+        Iterate (type ID, quantity) of the materials without creating views.
+        """
+        start, end = self._store.material_offsets[self._row], self._store.material_offsets[self._row + 1]
+        store = self._store
+        for index in range(start, end):
+            yield store.material_ids[index], store.material_quantities[index]
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Return the blueprint in the shape of models.FrontierBlueprint.
+        """
+        return {
+            "bp_id": self.bp_id,
+            "structures": list(self.structures),
+            "materials": [{"quantity": quantity, "typeID": type_id, "name": self._store.name(type_id)} for type_id, quantity in self.material_pairs()],
+            "time": self.time,
+            "max_production": self.max_production,
+            "product_count": self.product_count,
+            "product_name": self.product_name,
+        }
+
+
+class BlueprintStore(Mapping[int, tuple[Blueprint, ...]]):
+    """
+    Compact, read-only blueprint catalog keyed by product type ID.
+
+    Every (blueprint, product) pair is a row in a set of flat integer arrays sorted by product ID, materials are
+    stored CSR style: the materials of row r are material_ids[material_offsets[r]:material_offsets[r + 1]].
+    Products are found with a binary search over product_ids, and names and structure lists are interned so
+    each distinct string is stored once. Lookups return thin Blueprint views over the arrays.
+
+    The reverse index is built in the same pass: the rows consuming material consumer_ids[i] are
+    consumer_rows[consumer_offsets[i]:consumer_offsets[i + 1]].
+    """
+
+    def __init__(self) -> None:
+        self.product_ids = array(INT_TYPECODE)
+        self.product_offsets = array(INT_TYPECODE, [0])
+        self.row_product_ids = array(INT_TYPECODE)
+        self.row_bp_ids = array(INT_TYPECODE)
+        self.row_product_counts = array(INT_TYPECODE)
+        self.row_times = array(INT_TYPECODE)
+        self.row_max_productions = array(INT_TYPECODE)
+        self.row_structure_sets = array(INT_TYPECODE)
+        self.material_offsets = array(INT_TYPECODE, [0])
+        self.material_ids = array(INT_TYPECODE)
+        self.material_quantities = array(INT_TYPECODE)
+        self.consumer_ids = array(INT_TYPECODE)
+        self.consumer_offsets = array(INT_TYPECODE, [0])
+        self.consumer_rows = array(INT_TYPECODE)
+        self.structure_sets: list[tuple[str, ...]] = []
+        self.names: dict[int, str] = {}
+
+    @classmethod
+    def from_dicts(cls, blueprints: dict[int, list[dict]], item_types: dict[int, dict] | None = None) -> "BlueprintStore":
+        """
+        Build a store from blueprint dicts keyed by product ID, as returned by tools.create_crafting_json.
+        """
+        store = cls()
+        item_types = item_types or {}
+        structure_set_index: dict[tuple[str, ...], int] = {}
+        consumers: dict[int, list[int]] = {}
+
+        def intern_name(type_id: int) -> None:
+            name = item_types.get(type_id, {}).get("name")
+            if name is not None and type_id not in store.names:
+                store.names[type_id] = sys.intern(name)
+
+        for product_id in sorted(blueprints):
+            intern_name(product_id)
+            for bp in blueprints[product_id]:
+                structures = tuple(sys.intern(structure) for structure in bp.get("structures", []))
+                if structures not in structure_set_index:
+                    structure_set_index[structures] = len(store.structure_sets)
+                    store.structure_sets.append(structures)
+
+                store.row_product_ids.append(product_id)
+                store.row_bp_ids.append(int(bp["bp_id"]))
+                store.row_product_counts.append(bp.get("product_count", 1))
+                store.row_times.append(bp.get("time", 0))
+                store.row_max_productions.append(bp.get("max_production", 0))
+                store.row_structure_sets.append(structure_set_index[structures])
+                for material in bp["materials"]:
+                    store.material_ids.append(int(material["typeID"]))
+                    store.material_quantities.append(material["quantity"])
+                    intern_name(int(material["typeID"]))
+                    consumers.setdefault(int(material["typeID"]), []).append(len(store.row_bp_ids) - 1)
+                store.material_offsets.append(len(store.material_ids))
+
+            store.product_ids.append(product_id)
+            store.product_offsets.append(len(store.row_bp_ids))
+
+        for material_id in sorted(consumers):
+            store.consumer_ids.append(material_id)
+            store.consumer_rows.extend(consumers[material_id])
+            store.consumer_offsets.append(len(store.consumer_rows))
+
+        return store
+
+    @classmethod
+    def from_buffers(
+        cls, arrays: Mapping[str, memoryview], structure_sets: list[tuple[str, ...]], names: dict[int, str],
+    ) -> "BlueprintStore":
+        """
+        Build a store over existing integer buffers, for example memoryviews of a mapped snapshot, without copying them.
+        """
+        store = cls()
+        for name in STORE_ARRAYS:
+            setattr(store, name, arrays[name])
+        store.structure_sets = structure_sets
+        store.names = names
+        return store
+
+    def name(self, type_id: int) -> str:
+        return self.names.get(type_id, "Unknown")
+
+    def _product_index(self, product_id: int) -> int | None:
+        index = bisect_left(self.product_ids, product_id)
+        if index < len(self.product_ids) and self.product_ids[index] == product_id:
+            return index
+        return None
+
+    def __getitem__(self, product_id: int) -> tuple[Blueprint, ...]:
+        index = self._product_index(product_id)
+        if index is None:
+            raise KeyError(product_id)
+        return tuple(Blueprint(self, row) for row in range(self.product_offsets[index], self.product_offsets[index + 1]))
+
+    def __contains__(self, product_id: object) -> bool:
+        return isinstance(product_id, int) and self._product_index(product_id) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.product_ids)
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    def used_in(self, type_id: int) -> tuple[Blueprint, ...]:
+        """
+        Return every blueprint that consumes the item as a material.
+        """
+        index = bisect_left(self.consumer_ids, type_id)
+        if index == len(self.consumer_ids) or self.consumer_ids[index] != type_id:
+            return ()
+        rows = self.consumer_rows[self.consumer_offsets[index] : self.consumer_offsets[index + 1]]
+        return tuple(Blueprint(self, row) for row in rows)
+
+    def blueprint(self, product_id: int, bp_id: int) -> Blueprint | None:
+        """
+        Return the blueprint with the given ID producing the item, if there is one.
+        """
+        return next((bp for bp in self.get(product_id, ()) if bp.bp_id == bp_id), None)
+
+
+class PackedItemTypes(Mapping[int, dict]):
+    """
+    Read-only item types keyed by type ID, stored as one blob of JSON documents.
+
+    The document of type_ids[i] is blob[offsets[i]:offsets[i + 1]], it is only decoded when the item is looked up,
+    so the blob can live in a mapped snapshot shared by every worker. The mass and volume of every item are
+    also kept in columns aligned with type_ids, so they can be read without decoding documents.
+    """
+
+    def __init__(
+        self, type_ids: Sequence[int], offsets: Sequence[int], blob: bytes | memoryview, masses: Sequence[float], volumes: Sequence[float],
+    ) -> None:
+        self.type_ids = type_ids
+        self.offsets = offsets
+        self.blob = blob
+        self.masses = masses
+        self.volumes = volumes
+
+    @classmethod
+    def from_dict(cls, item_types: Mapping[int, dict]) -> "PackedItemTypes":
+        type_ids = array(INT_TYPECODE, sorted(item_types))
+        offsets = array(INT_TYPECODE, [0])
+        masses = array(FLOAT_TYPECODE)
+        volumes = array(FLOAT_TYPECODE)
+        documents = []
+        for type_id in type_ids:
+            item = item_types[type_id]
+            document = json.dumps(item, separators=(",", ":")).encode()
+            documents.append(document)
+            offsets.append(offsets[-1] + len(document))
+            masses.append(float(item.get("mass") or 0))
+            volumes.append(float(item.get("volume") or 0))
+        return cls(type_ids, offsets, b"".join(documents), masses, volumes)
+
+    def _index(self, type_id: object) -> int | None:
+        if not isinstance(type_id, int):
+            return None
+        index = bisect_left(self.type_ids, type_id)
+        if index < len(self.type_ids) and self.type_ids[index] == type_id:
+            return index
+        return None
+
+    def physical(self, type_ids: Sequence[int]) -> tuple[array, array]:
+        """
+        Return the mass and volume of each item as arrays aligned with type_ids, 0 for unknown items.
+        """
+        masses = array(FLOAT_TYPECODE, [0.0]) * len(type_ids)
+        volumes = array(FLOAT_TYPECODE, [0.0]) * len(type_ids)
+        for position, type_id in enumerate(type_ids):
+            index = self._index(type_id)
+            if index is not None:
+                masses[position] = self.masses[index]
+                volumes[position] = self.volumes[index]
+        return masses, volumes
+
+    def __getitem__(self, type_id: int) -> dict:
+        index = self._index(type_id)
+        if index is None:
+            raise KeyError(type_id)
+        return json.loads(bytes(self.blob[self.offsets[index] : self.offsets[index + 1]]))
+
+    def __contains__(self, type_id: object) -> bool:
+        return self._index(type_id) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.type_ids)
+
+    def __len__(self) -> int:
+        return len(self.type_ids)
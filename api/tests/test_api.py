@@ -1,39 +1,54 @@
-from collections.abc import Generator
+import asyncio
+import uuid
+from collections.abc import AsyncGenerator, Generator
 from http import HTTPStatus
-from unittest.mock import patch
+from pathlib import Path
+from typing import Any
 
 import pytest
+from fastapi import WebSocketDisconnect, status
 from fastapi.testclient import TestClient
-from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy import Delete, Insert, Update, update
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import SQLModel, col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel.pool import StaticPool
 
-import schema
+import api
+import repository
 from api import app
-from schema import get_session
+from cache import session_reads
+from catalog import get_catalog
+from events import broker, session_channel
+from schema import CraftingIngredient, CraftingSession, SessionInventory, get_session
 
 TARGET_ITEM_ID = 88561
 TARGET_BLUEPRINT_ID = 88611
 
 
-@pytest.fixture(name="session")
-def session_fixture() -> Generator[Session, None, None]:
+@pytest.fixture(name="engine")
+def engine_fixture() -> Generator[AsyncEngine, None, None]:
     # Create in-memory SQLite database
-    engine = create_engine(
-        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool,
-    )
-    SQLModel.metadata.create_all(engine)
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
 
-    # Patch the engine in schema module to use our test engine
-    with patch.object(schema, "engine", engine), Session(engine) as session:
-        yield session
+    async def create_tables() -> None:
+        async with engine.begin() as connection:
+            await connection.run_sync(SQLModel.metadata.create_all)
+
+    asyncio.run(create_tables())
+    yield engine
+    asyncio.run(engine.dispose())
 
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session) -> Generator[TestClient, None, None]:
-    def get_session_override() -> Session:
-        return session
+def client_fixture(engine: AsyncEngine, monkeypatch: pytest.MonkeyPatch) -> Generator[TestClient, None, None]:
+    async def get_session_override() -> AsyncGenerator[AsyncSession, None]:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
 
     app.dependency_overrides[get_session] = get_session_override
+    # the websocket endpoint opens its own short lived session on the engine
+    monkeypatch.setattr(api, "engine", engine)
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
@@ -70,6 +85,51 @@ def test_get_targets(client: TestClient) -> None:
     assert response.json() == [{"item_id": TARGET_ITEM_ID, "needed_quantity": 10, "blueprint_id": TARGET_BLUEPRINT_ID, "crafted_quantity": 0, "session_id": 1, "id": 1}]
 
 
+def test_add_target_without_matching_blueprint(client: TestClient) -> None:
+    session_id = client.post("/crafting-session").json()
+    response = client.post(f"/crafting-session/{session_id}/target", json={"item_id": TARGET_ITEM_ID, "needed_quantity": 1, "blueprint_id": 1})
+    assert response.status_code == HTTPStatus.OK
+    response = client.post(f"/crafting-session/{session_id}/target", json={"item_id": 1, "needed_quantity": 1, "blueprint_id": 1})
+    assert response.status_code == HTTPStatus.OK
+
+    assert len(client.get(f"/crafting-session/{session_id}/targets").json()) == 2  # noqa: PLR2004
+    assert client.get(f"/crafting-session/{session_id}/target/{TARGET_ITEM_ID}/ingredients").json() == []
+
+
+def test_get_targets_paged(client: TestClient) -> None:
+    session_id = client.post("/crafting-session").json()
+    for _ in range(3):
+        client.post(f"/crafting-session/{session_id}/target", json={"item_id": TARGET_ITEM_ID, "needed_quantity": 10, "blueprint_id": TARGET_BLUEPRINT_ID})
+
+    response = client.get(f"/crafting-session/{session_id}/targets", params={"limit": 2, "fields": "needed_quantity"})
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == [{"id": 1, "needed_quantity": 10}, {"id": 2, "needed_quantity": 10}]
+
+    response = client.get(f"/crafting-session/{session_id}/targets", params={"limit": 2, "after": response.headers["X-Next-Cursor"]})
+    assert response.status_code == HTTPStatus.OK
+    assert [target["id"] for target in response.json()] == [3]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get(f"/crafting-session/{session_id}/targets", params={"fields": "id,name"})
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_get_targets_summary(client: TestClient) -> None:
+    session_id = client.post("/crafting-session").json()
+    client.post(f"/crafting-session/{session_id}/target", json={"item_id": TARGET_ITEM_ID, "needed_quantity": 10, "blueprint_id": TARGET_BLUEPRINT_ID})
+    client.post(f"/crafting-session/{session_id}/target/{TARGET_ITEM_ID}/ingredient/77811/100")
+    needed = sum(ingredient["needed_quantity"] for ingredient in client.get(f"/crafting-session/{session_id}/target/{TARGET_ITEM_ID}/ingredients").json())
+
+    response = client.get(f"/crafting-session/{session_id}/targets", params={"fields": "progress,ingredients_crafted,ingredients_needed"})
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == [{"id": 1, "ingredients_needed": needed, "ingredients_crafted": 100, "progress": pytest.approx(100 / needed)}]
+
+    response = client.get(f"/crafting-session/{session_id}", params={"summary": True})
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["targets"] == 1
+    assert response.json()["ingredients_crafted"] == 100  # noqa: PLR2004
+
+
 def test_get_target_ingredients(client: TestClient) -> None:
     response = client.post("/crafting-session")
     assert response.status_code == HTTPStatus.OK
@@ -99,3 +159,305 @@ def test_modify_ingredient_quantity(client: TestClient) -> None:
     response = client.get(f"/crafting-session/{session_id}/target/{TARGET_ITEM_ID}/ingredients")
     assert response.status_code == HTTPStatus.OK
     assert response.json() == [{"item_id": 77811, "needed_quantity": 728, "crafted_quantity": 100, "id": 1, "target_id": 1}]
+
+
+def test_session_reads_see_writes(client: TestClient) -> None:
+    session_id = client.post("/crafting-session").json()
+    client.post(f"/crafting-session/{session_id}/target", json={"item_id": TARGET_ITEM_ID, "needed_quantity": 10, "blueprint_id": TARGET_BLUEPRINT_ID})
+    ingredients_url = f"/crafting-session/{session_id}/target/{TARGET_ITEM_ID}/ingredients"
+    assert client.get(ingredients_url).json()[0]["crafted_quantity"] == 0
+    assert client.get(f"/crafting-session/{session_id}", params={"summary": True}).json()["ingredients_crafted"] == 0
+
+    client.post(f"/crafting-session/{session_id}/target/{TARGET_ITEM_ID}/ingredient/77811/5")
+    assert client.get(ingredients_url).json()[0]["crafted_quantity"] == 5  # noqa: PLR2004
+    assert client.get(f"/crafting-session/{session_id}", params={"summary": True}).json()["ingredients_crafted"] == 5  # noqa: PLR2004
+
+    client.post(f"/crafting-session/{session_id}/target", json={"item_id": TARGET_ITEM_ID, "needed_quantity": 1, "blueprint_id": TARGET_BLUEPRINT_ID})
+    assert len(client.get(f"/crafting-session/{session_id}/targets").json()) == 2  # noqa: PLR2004
+
+
+def test_get_raw_materials(client: TestClient) -> None:
+    response = client.get(f"/items/{TARGET_ITEM_ID}/raw-materials", params={"quantity": 10})
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == [{"type_id": 77811, "name": "Carbon Ore", "quantity": 7280.0}]
+
+    response = client.get("/items/1/raw-materials")
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_create_plan(client: TestClient) -> None:
+    targets = [
+        {"item_id": TARGET_ITEM_ID, "quantity": 2, "blueprint_id": TARGET_BLUEPRINT_ID},
+        {"item_id": TARGET_ITEM_ID, "quantity": 3},
+    ]
+    response = client.post("/plan", json={"targets": targets})
+    assert response.status_code == HTTPStatus.OK
+    plan = response.json()
+    assert [(step["item_id"], step["runs"]) for step in plan["steps"]] == [(TARGET_ITEM_ID, 5)]
+    assert plan["raw_materials"] == [{"type_id": 77811, "name": "Carbon Ore", "quantity": 3640.0}]
+
+    response = client.post("/plan", json={"targets": [{"item_id": TARGET_ITEM_ID, "quantity": 1, "blueprint_id": 1}]})
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_create_plan_with_objective(client: TestClient) -> None:
+    targets = [{"item_id": TARGET_ITEM_ID, "quantity": 5}]
+    response = client.post("/plan", json={"targets": targets, "objective": "time"})
+    assert response.status_code == HTTPStatus.OK
+    assert [(step["item_id"], step["runs"]) for step in response.json()["steps"]] == [(TARGET_ITEM_ID, 5)]
+
+    response = client.post("/plan", json={"targets": targets, "objective": "structures", "owned_structures": []})
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_get_item_etag(client: TestClient) -> None:
+    response = client.get(f"/items/{TARGET_ITEM_ID}")
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()[0]["bp_id"] == TARGET_BLUEPRINT_ID
+    assert response.json()[0]["materials"][0]["typeID"] == 77811  # noqa: PLR2004
+    etag = response.headers["ETag"]
+    # clients revalidate every time, so a reloaded catalog isn't hidden behind cached bodies
+    assert "no-cache" in response.headers["Cache-Control"]
+
+    response = client.get(f"/items/{TARGET_ITEM_ID}", headers={"If-None-Match": etag})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+
+    response = client.get("/items/1")
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_session_updates(client: TestClient) -> None:
+    response = client.post("/crafting-session")
+    session_id = response.json()
+
+    with client.websocket_connect(f"/crafting-session/{session_id}/ws") as websocket:
+        client.post(f"/crafting-session/{session_id}/target", json={"item_id": TARGET_ITEM_ID, "needed_quantity": 10, "blueprint_id": TARGET_BLUEPRINT_ID})
+        message = websocket.receive_json()
+        assert message["type"] == "target_added"
+        assert message["target"]["item_id"] == TARGET_ITEM_ID
+        assert message["ingredients"][0]["item_id"] == 77811  # noqa: PLR2004
+
+        client.post(f"/crafting-session/{session_id}/target/{TARGET_ITEM_ID}/ingredient/77811/5")
+        message = websocket.receive_json()
+        assert message == {"type": "ingredient_updated", "target_id": TARGET_ITEM_ID, "ingredient_id": 77811, "crafted_quantity": 5}
+
+
+def test_session_updates_close_when_forwarding_fails(client: TestClient) -> None:
+    session_id = client.post("/crafting-session").json()
+
+    with client.websocket_connect(f"/crafting-session/{session_id}/ws") as websocket:
+        # a message that can't be serialized stands in for a broker or send error
+        asyncio.run(broker.publish(session_channel(uuid.UUID(session_id)), {"type": "broken", "items": {1}}))
+        with pytest.raises(WebSocketDisconnect) as disconnect:
+            websocket.receive_json()
+        assert disconnect.value.code == status.WS_1011_INTERNAL_ERROR
+
+
+def test_session_updates_release_the_connection(client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pooled = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'crafting_tool.db'}")
+
+    async def create_session() -> uuid.UUID:
+        async with pooled.begin() as connection:
+            await connection.run_sync(SQLModel.metadata.create_all)
+        async with AsyncSession(pooled, expire_on_commit=False) as db:
+            return await repository.create_session(db)
+
+    session_id = asyncio.run(create_session())
+    monkeypatch.setattr(api, "engine", pooled)
+    with client.websocket_connect(f"/crafting-session/{session_id}/ws"):
+        # an open socket doesn't keep a database connection checked out
+        assert pooled.pool.checkedout() == 0  # type: ignore[attr-defined]
+    asyncio.run(pooled.dispose())
+
+
+def test_bulk_ingredient_updates(client: TestClient) -> None:
+    session_id = client.post("/crafting-session").json()
+    for _ in range(2):
+        client.post(f"/crafting-session/{session_id}/target", json={"item_id": TARGET_ITEM_ID, "needed_quantity": 1, "blueprint_id": TARGET_BLUEPRINT_ID})
+
+    updates = [{"target_id": TARGET_ITEM_ID, "ingredient_id": 77811, "delta": 100}, {"target_id": TARGET_ITEM_ID, "ingredient_id": 77811, "delta": 28}]
+    response = client.post(f"/crafting-session/{session_id}/ingredients", json=updates)
+    assert response.status_code == HTTPStatus.OK
+    assert [ingredient["crafted_quantity"] for ingredient in response.json()["ingredients"]] == [128]
+
+    # nothing is applied when one of the updates is unknown
+    updates = [{"target_id": TARGET_ITEM_ID, "ingredient_id": 77811, "delta": 1}, {"target_id": TARGET_ITEM_ID, "ingredient_id": 1, "delta": 1}]
+    response = client.post(f"/crafting-session/{session_id}/ingredients", json=updates)
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+    response = client.post(f"/crafting-session/{session_id}/ingredients/distribute", json=[{"item_id": 77811, "quantity": 1000}])
+    assert response.status_code == HTTPStatus.OK
+    assert [(ingredient["target_id"], ingredient["crafted_quantity"]) for ingredient in response.json()["ingredients"]] == [(1, 728), (2, 400)]
+    assert response.json()["leftover"] == []
+
+    response = client.post(f"/crafting-session/{session_id}/ingredients/distribute", json=[{"item_id": 77811, "quantity": 500}])
+    assert response.json()["leftover"] == [{"item_id": 77811, "quantity": 172}]
+
+
+def test_distribution_never_overfills(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    session_id = client.post("/crafting-session").json()
+    client.post(f"/crafting-session/{session_id}/target", json={"item_id": TARGET_ITEM_ID, "needed_quantity": 1, "blueprint_id": TARGET_BLUEPRINT_ID})
+    [needed] = [ingredient["needed_quantity"] for ingredient in client.get(f"/crafting-session/{session_id}/target/{TARGET_ITEM_ID}/ingredients").json()]
+    exec_ = AsyncSession.exec
+
+    async def contribute_before_update(db: AsyncSession, statement: Any, *args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+        if isinstance(statement, Update):
+            # another update lands between reading the remaining quantity and applying the distribution
+            monkeypatch.setattr(AsyncSession, "exec", exec_)
+            await db.exec(update(CraftingIngredient).values(crafted_quantity=col(CraftingIngredient.crafted_quantity) + 100))  # type: ignore[call-overload]
+        return await exec_(db, statement, *args, **kwargs)
+
+    monkeypatch.setattr(AsyncSession, "exec", contribute_before_update)
+    response = client.post(f"/crafting-session/{session_id}/ingredients/distribute", json=[{"item_id": 77811, "quantity": needed}])
+    assert response.status_code == HTTPStatus.OK
+    assert [ingredient["crafted_quantity"] for ingredient in response.json()["ingredients"]] == [needed]
+    # the part that no longer fit after the other update is reported as leftover
+    assert response.json()["leftover"] == [{"item_id": 77811, "quantity": 100}]
+
+
+def test_unknown_sessions_leave_no_cache_version(client: TestClient) -> None:
+    session_uuid = uuid.uuid4()
+    assert client.get(f"/crafting-session/{session_uuid}").status_code == HTTPStatus.NOT_FOUND
+    assert client.get(f"/crafting-session/{session_uuid}/targets").status_code == HTTPStatus.NOT_FOUND
+    assert asyncio.run(session_reads.backend.get(session_reads.version_key(session_uuid))) is None
+
+
+def test_get_used_in(client: TestClient) -> None:
+    response = client.get("/items/77811/used-in")
+    assert response.status_code == HTTPStatus.OK
+    assert TARGET_ITEM_ID in {used["product_id"] for used in response.json()}
+
+    response = client.get("/items/77811/used-in", params={"transitive": True})
+    assert response.status_code == HTTPStatus.OK
+    assert TARGET_ITEM_ID in {used["material_id"] for used in response.json()}
+
+
+def test_reload_catalog_requires_admin_token(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(api, "ADMIN_TOKEN", None)
+    assert client.post("/admin/reload-catalog").status_code == HTTPStatus.NOT_FOUND
+
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    response = client.post("/admin/reload-catalog", headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+    version = get_catalog().version
+    response = client.post("/admin/reload-catalog", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == HTTPStatus.OK
+    # the game data files didn't change, so the current catalog is kept
+    assert response.json() == {"version": version, "reloaded": False}
+
+
+def test_session_hauling(client: TestClient) -> None:
+    session_id = client.post("/crafting-session").json()
+    client.post(f"/crafting-session/{session_id}/target", json={"item_id": TARGET_ITEM_ID, "needed_quantity": 10, "blueprint_id": TARGET_BLUEPRINT_ID})
+    client.post(f"/crafting-session/{session_id}/target/{TARGET_ITEM_ID}/ingredient/77811/100")
+
+    # 628 carbon ore still needed at 0.1 m3 and 1.5 kg each
+    response = client.get(f"/crafting-session/{session_id}/hauling", params={"cargo_capacity": 50})
+    assert response.status_code == HTTPStatus.OK
+    assert [[item["quantity"] for item in trip["items"]] for trip in response.json()["trips"]] == [[500], [128]]
+
+    response = client.get(f"/crafting-session/{session_id}/hauling", params={"cargo_capacity": 50, "mass_limit": 600})
+    assert [[item["quantity"] for item in trip["items"]] for trip in response.json()["trips"]] == [[400], [228]]
+
+    response = client.get(f"/crafting-session/{session_id}/hauling", params={"cargo_capacity": 0.05})
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_plan_hauling(client: TestClient) -> None:
+    response = client.post("/plan/hauling", json={"targets": [{"item_id": TARGET_ITEM_ID, "quantity": 1}], "cargo_capacity": 10, "mass_limit": 100})
+    assert response.status_code == HTTPStatus.OK
+    hauling = response.json()
+    # 66 carbon ore per trip by mass
+    assert len(hauling["trips"]) == 12  # noqa: PLR2004
+    assert sum(trip["items"][0]["quantity"] for trip in hauling["trips"]) == 728  # noqa: PLR2004
+
+
+def test_inventory_and_remaining(client: TestClient) -> None:
+    session_id = client.post("/crafting-session").json()
+    client.post(f"/crafting-session/{session_id}/target", json={"item_id": TARGET_ITEM_ID, "needed_quantity": 10, "blueprint_id": TARGET_BLUEPRINT_ID})
+
+    response = client.get(f"/crafting-session/{session_id}/remaining")
+    assert response.status_code == HTTPStatus.OK
+    assert [(need["item_id"], need["remaining"]) for need in response.json()] == [(77811, 728)]
+
+    response = client.put(f"/crafting-session/{session_id}/inventory", json=[{"item_id": 77811, "quantity": 28}, {"item_id": 1, "quantity": 5}])
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == [{"item_id": 1, "quantity": 5}, {"item_id": 77811, "quantity": 28}]
+
+    response = client.get(f"/crafting-session/{session_id}/remaining")
+    assert response.json() == [{"item_id": 77811, "name": "Carbon Ore", "needed": 728, "on_hand": 28, "remaining": 700, "runs": 0}]
+
+    response = client.put(f"/crafting-session/{session_id}/inventory", json=[{"item_id": 1, "quantity": 0}])
+    assert response.json() == [{"item_id": 77811, "quantity": 28}]
+
+    response = client.get(f"/crafting-session/{uuid.uuid4()}/remaining")
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_concurrent_inventory_updates(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    session_id = client.post("/crafting-session").json()
+    exec_ = AsyncSession.exec
+
+    async def insert_concurrently(db: AsyncSession, statement: Any, *args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+        if not isinstance(statement, Insert | Delete):
+            return await exec_(db, statement, *args, **kwargs)
+        # another update of the same item inserts it once this one has cleared its rows
+        monkeypatch.setattr(AsyncSession, "exec", exec_)
+        deleted = await exec_(db, statement, *args, **kwargs) if isinstance(statement, Delete) else None  # type: ignore[call-overload]
+        session_row_id = (await exec_(db, select(CraftingSession.id).where(CraftingSession.session_uuid == uuid.UUID(session_id)))).one()
+        db.add(SessionInventory(session_id=session_row_id, item_id=77811, quantity=3))
+        await db.flush()
+        return deleted if isinstance(statement, Delete) else await exec_(db, statement, *args, **kwargs)  # type: ignore[call-overload]
+
+    monkeypatch.setattr(AsyncSession, "exec", insert_concurrently)
+    response = client.put(f"/crafting-session/{session_id}/inventory", json=[{"item_id": 77811, "quantity": 28}])
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == [{"item_id": 77811, "quantity": 28}]
+
+
+@pytest.mark.parametrize("export_format", ["ndjson", "csv"])
+def test_export_and_import_session(client: TestClient, export_format: str) -> None:
+    session_id = client.post("/crafting-session").json()
+    client.post(f"/crafting-session/{session_id}/target", json={"item_id": TARGET_ITEM_ID, "needed_quantity": 10, "blueprint_id": TARGET_BLUEPRINT_ID})
+    client.post(f"/crafting-session/{session_id}/target/{TARGET_ITEM_ID}/ingredient/77811/100")
+    client.put(f"/crafting-session/{session_id}/inventory", json=[{"item_id": 77811, "quantity": 28}])
+
+    response = client.get(f"/crafting-session/{session_id}/export", params={"format": export_format})
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"].startswith("text/csv" if export_format == "csv" else "application/x-ndjson")
+
+    response = client.post("/crafting-session/import", params={"format": export_format}, content=response.content)
+    assert response.status_code == HTTPStatus.OK
+    imported = response.json()
+    assert imported["session_uuid"] != session_id
+    assert (imported["targets"], imported["ingredients"], imported["inventory"]) == (1, 1, 1)
+
+    targets = client.get(f"/crafting-session/{imported['session_uuid']}/targets").json()
+    assert [(target["item_id"], target["needed_quantity"]) for target in targets] == [(TARGET_ITEM_ID, 10)]
+    ingredients = client.get(f"/crafting-session/{imported['session_uuid']}/target/{TARGET_ITEM_ID}/ingredients").json()
+    assert [(ingredient["item_id"], ingredient["crafted_quantity"]) for ingredient in ingredients] == [(77811, 100)]
+    assert client.get(f"/crafting-session/{imported['session_uuid']}/inventory").json() == [{"item_id": 77811, "quantity": 28}]
+
+
+def test_import_rejects_dangling_ingredients(client: TestClient) -> None:
+    body = b'{"record": "ingredient", "target_id": 5, "item_id": 77811, "needed_quantity": 1}\n'
+    response = client.post("/crafting-session/import", content=body)
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    response = client.post("/crafting-session/import", content=b'{"record": "target"}\n')
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json()["detail"].startswith("Line 1")
+
+    response = client.post("/crafting-session/import", content=b'{"record": "inventory", "note": "caf\xe9"}\n')
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json()["detail"].startswith("Line 1")
+
+
+def test_export_plan(client: TestClient) -> None:
+    response = client.post("/plan/export", params={"format": "csv"}, json={"targets": [{"item_id": TARGET_ITEM_ID, "quantity": 5}]})
+    assert response.status_code == HTTPStatus.OK
+    lines = response.text.splitlines()
+    assert lines[0] == "record,item_id,name,blueprint_id,runs,needed_quantity,produced_quantity,time,structures"
+    assert [line.split(",")[0] for line in lines[1:]] == ["step", "raw_material"]
@@ -0,0 +1,54 @@
+import pytest
+
+from bom import CycleError, RawMaterialTable, topological_order
+from store import BlueprintStore
+
+ORE = 1
+GAS = 2
+
+BLUEPRINT_DICTS = {
+    10: [{"bp_id": 100, "materials": [{"typeID": ORE, "quantity": 4}], "product_count": 2}],
+    11: [
+        {"bp_id": 110, "materials": [{"typeID": 10, "quantity": 3}], "product_count": 1},
+        {"bp_id": 111, "materials": [{"typeID": GAS, "quantity": 10}], "product_count": 1},
+    ],
+    12: [{"bp_id": 120, "materials": [{"typeID": 11, "quantity": 2}, {"typeID": ORE, "quantity": 1}], "product_count": 1}],
+}
+BLUEPRINTS = BlueprintStore.from_dicts(BLUEPRINT_DICTS)
+
+
+def test_topological_order_puts_materials_first() -> None:
+    order, cyclic = topological_order(BLUEPRINTS)
+    assert order == [10, 11, 12]
+    assert cyclic == set()
+
+
+def test_raw_materials_strategies() -> None:
+    cheapest = RawMaterialTable(BLUEPRINTS, "min")
+    assert cheapest.raw_materials(12) == {ORE: 13.0}
+    assert cheapest.choice[11] == BLUEPRINTS[11][0].bp_id
+
+    priciest = RawMaterialTable(BLUEPRINTS, "max")
+    assert priciest.raw_materials(12) == {GAS: 20.0, ORE: 1.0}
+
+    forced = RawMaterialTable(BLUEPRINTS, "min", overrides={11: 111})
+    assert forced.raw_materials(11) == {GAS: 10.0}
+
+    no_ore = RawMaterialTable(BLUEPRINTS, "min", weights={ORE: 1})
+    assert no_ore.raw_materials(11) == {GAS: 10.0}
+
+    assert cheapest.raw_materials(ORE) == {ORE: 1.0}
+
+
+def test_cycles_are_detected() -> None:
+    blueprints = BlueprintStore.from_dicts({
+        **BLUEPRINT_DICTS,
+        20: [{"bp_id": 200, "materials": [{"typeID": 21, "quantity": 1}], "product_count": 1}],
+        21: [{"bp_id": 210, "materials": [{"typeID": 20, "quantity": 1}], "product_count": 1}],
+        22: [{"bp_id": 220, "materials": [{"typeID": 21, "quantity": 1}], "product_count": 1}],
+    })
+    table = RawMaterialTable(blueprints)
+    assert table.cyclic == {20, 21, 22}
+    assert table.raw_materials(12) == {ORE: 13.0}
+    with pytest.raises(CycleError):
+        table.raw_materials(22)
@@ -0,0 +1,68 @@
+import asyncio
+import uuid
+from unittest.mock import patch
+
+from cache import InMemoryCache, SessionReadCache
+
+
+def test_in_memory_cache_evicts_least_recent_and_expired() -> None:
+    async def scenario() -> None:
+        cache = InMemoryCache(max_entries=2)
+        await cache.set("a", b"1")
+        await cache.set("b", b"2", ex=10)
+        assert await cache.get("a") == b"1"
+        await cache.set("c", b"3")
+        assert await cache.get("b") is None
+        assert await cache.get("a") == b"1"
+
+        await cache.set("d", b"4", ex=10)
+        with patch("cache.time.monotonic", return_value=float("inf")):
+            assert await cache.get("d") is None
+        assert await cache.incr("counter") == 1
+
+    asyncio.run(scenario())
+
+
+def test_writes_move_the_session_to_a_new_version() -> None:
+    async def scenario() -> None:
+        reads = SessionReadCache(InMemoryCache(), ttl=60)
+        session_uuid = uuid.uuid4()
+        assert await reads.get(session_uuid, "targets") == (None, None)
+        await reads.set(session_uuid, None, "targets", b"[]")
+        version, body = await reads.get(session_uuid, "targets")
+        assert version is not None
+        assert body == b"[]"
+
+        await reads.invalidate(session_uuid)
+        new_version, body = await reads.get(session_uuid, "targets")
+        assert new_version != version
+        assert body is None
+
+        # a response read before the write is stored under the old version and never served
+        await reads.set(session_uuid, version, "targets", b"[stale]")
+        assert await reads.get(session_uuid, "targets") == (new_version, None)
+
+    asyncio.run(scenario())
+
+
+def test_versions_are_only_created_for_stored_responses() -> None:
+    async def scenario() -> None:
+        backend = InMemoryCache()
+        reads = SessionReadCache(backend, ttl=60)
+        session_uuid = uuid.uuid4()
+
+        # an unknown session is only ever read, a 404 stores nothing
+        assert await reads.get(session_uuid, "session") == (None, None)
+        assert backend.entries == {}
+
+        # a write between the read and storing its response already created a version, the response isn't stored
+        version, _ = await reads.get(session_uuid, "session")
+        await reads.invalidate(session_uuid)
+        await reads.set(session_uuid, version, "session", b"{}")
+        assert (await reads.get(session_uuid, "session"))[1] is None
+
+        # version keys expire too, after the entries stored under them
+        with patch("cache.time.monotonic", return_value=float("inf")):
+            assert await backend.get(reads.version_key(session_uuid)) is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,125 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import catalog
+
+BLUEPRINTS = {1: [{"bp_id": 2, "materials": []}]}
+ITEM_TYPES = {1: {"name": "Test Item"}}
+
+
+def write_sources(tmp_path: Path, db_content: bytes = b"db") -> tuple[str, str, str]:
+    (tmp_path / "blueprint.db").write_bytes(db_content)
+    (tmp_path / "names.json").write_text("{}")
+    (tmp_path / "types.json").write_text("{}")
+    return str(tmp_path / "blueprint.db"), str(tmp_path / "names.json"), str(tmp_path / "types.json")
+
+
+def test_snapshot_is_reused_until_sources_change(tmp_path: Path) -> None:
+    snapshot = str(tmp_path / "catalog.snapshot")
+    sources = write_sources(tmp_path)
+
+    with patch.object(catalog, "create_crafting_json", return_value=(BLUEPRINTS, ITEM_TYPES)) as build:
+        first = catalog.load_catalog(snapshot, *sources)
+        second = catalog.load_catalog(snapshot, *sources)
+        assert build.call_count == 1
+        assert second.blueprints[1][0].bp_id == BLUEPRINTS[1][0]["bp_id"]
+        assert second.item_types == ITEM_TYPES
+        assert second.version == first.version
+
+        sources = write_sources(tmp_path, b"new db")
+        third = catalog.load_catalog(snapshot, *sources)
+        assert build.call_count == 2  # noqa: PLR2004
+        assert third.version != first.version
+
+
+def test_snapshot_is_mapped_not_copied(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    snapshot = str(tmp_path / "catalog.snapshot")
+    sources = write_sources(tmp_path)
+
+    with patch.object(catalog, "create_crafting_json", return_value=(BLUEPRINTS, ITEM_TYPES)) as build:
+        built = catalog.load_catalog(snapshot, *sources)
+
+        # workers started by serve.py trust the parent's version, even if hashing would disagree
+        monkeypatch.setenv(catalog.SNAPSHOT_VERSION_ENV, built.version)
+        sources = write_sources(tmp_path, b"changed after the parent built the snapshot")
+        mapped = catalog.load_catalog(snapshot, *sources)
+        assert build.call_count == 1
+
+    assert isinstance(mapped.blueprints.row_bp_ids, memoryview)
+    assert isinstance(mapped.item_types.blob, memoryview)
+    assert mapped.blueprints[1][0].to_dict() == built.blueprints[1][0].to_dict()
+    assert mapped.item_types[1] == ITEM_TYPES[1]
+
+
+def test_concurrent_builds_dont_collide(tmp_path: Path) -> None:
+    snapshot = str(tmp_path / "catalog.snapshot")
+    sources = write_sources(tmp_path)
+    builds = 8
+    barrier = threading.Barrier(builds)
+
+    def create_crafting_json(*_: str) -> tuple[dict, dict]:
+        barrier.wait()
+        return BLUEPRINTS, ITEM_TYPES
+
+    with patch.object(catalog, "create_crafting_json", side_effect=create_crafting_json), ThreadPoolExecutor(builds) as pool:
+        built = list(pool.map(lambda _: catalog.build_snapshot(snapshot, *sources), range(builds)))
+
+    assert all(b.blueprints[1][0].bp_id == BLUEPRINTS[1][0]["bp_id"] for b in built)
+    assert sorted(path.name for path in tmp_path.iterdir() if path.name.startswith("catalog.snapshot")) == ["catalog.snapshot"]
+
+
+def test_concurrent_loads_build_once(tmp_path: Path) -> None:
+    snapshot = str(tmp_path / "catalog.snapshot")
+    sources = write_sources(tmp_path)
+    loads = 4
+    barrier = threading.Barrier(loads)
+
+    def create_crafting_json(*_: str) -> tuple[dict, dict]:
+        time.sleep(0.05)
+        return BLUEPRINTS, ITEM_TYPES
+
+    def load(_: int) -> str:
+        barrier.wait()
+        return catalog.load_catalog(snapshot, *sources).version
+
+    with patch.object(catalog, "create_crafting_json", side_effect=create_crafting_json) as build, ThreadPoolExecutor(loads) as pool:
+        versions = set(pool.map(load, range(loads)))
+
+    # the loads that waited on the lock mapped the snapshot the first one built
+    assert build.call_count == 1
+    assert len(versions) == 1
+
+
+def test_reload_swaps_in_new_catalog(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    snapshot = str(tmp_path / "catalog.snapshot")
+    sources = write_sources(tmp_path)
+    monkeypatch.setattr(catalog, "_catalog", None)
+
+    with patch.object(catalog, "create_crafting_json", return_value=(BLUEPRINTS, ITEM_TYPES)):
+        first = catalog.reload_catalog(snapshot, *sources)
+        assert first is catalog.get_catalog()
+        assert catalog.reload_catalog(snapshot, *sources) is None
+
+        sources = write_sources(tmp_path, b"new db")
+        second = catalog.reload_catalog(snapshot, *sources)
+
+    assert second is catalog.get_catalog()
+    assert first is not None
+    assert second is not None
+    assert second.version != first.version
+    # the previous catalog stays usable by requests that still hold it, even though its file was replaced
+    assert first.blueprints[1][0].bp_id == BLUEPRINTS[1][0]["bp_id"]
+
+
+def test_reload_failure_keeps_current_catalog(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    current = catalog.Catalog(version="current", blueprints=catalog.BlueprintStore(), item_types=catalog.PackedItemTypes.from_dict({}))
+    monkeypatch.setattr(catalog, "_catalog", current)
+
+    with patch.object(catalog, "create_crafting_json", side_effect=OSError("partial copy")), pytest.raises(catalog.CatalogError):
+        catalog.reload_catalog(str(tmp_path / "catalog.snapshot"), *write_sources(tmp_path))
+    assert catalog.get_catalog() is current
@@ -0,0 +1,86 @@
+import asyncio
+import json
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request, Response
+
+import ccp
+import tools
+
+TOTAL_TYPES = 2500
+ETAG = '"types-v1"'
+
+
+def create_stub(revalidate: bool = True) -> tuple[FastAPI, list[int]]:  # noqa: FBT001, FBT002
+    stub = FastAPI()
+    requested_offsets: list[int] = []
+
+    @stub.get("/v2/types")
+    def get_types(request: Request, limit: int, offset: int) -> Response:
+        requested_offsets.append(offset)
+        if revalidate and request.headers.get("If-None-Match") == ETAG:
+            return Response(status_code=304)
+        data = [{"id": i, "name": f"Type {i}"} for i in range(offset, min(offset + limit, TOTAL_TYPES))]
+        return Response(
+            content=json.dumps({"data": data, "metadata": {"total": TOTAL_TYPES, "limit": limit, "offset": offset}}),
+            media_type="application/json",
+            headers={"ETag": ETAG},
+        )
+
+    return stub, requested_offsets
+
+
+def test_fetch_all_types_pages_and_revalidates(tmp_path: Path) -> None:
+    stub, requested_offsets = create_stub()
+    cache = ccp.TypesCache(str(tmp_path / "types_cache.json"))
+
+    async def fetch() -> bool:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stub), base_url="http://stub") as client:
+            return await ccp.fetch_all_types_async(client, cache)
+
+    assert asyncio.run(fetch()) is True
+    assert sorted(requested_offsets) == [0, 1000, 2000]
+    types = cache.types()
+    assert types is not None
+    assert len(types) == TOTAL_TYPES
+    assert types[2499]["name"] == "Type 2499"
+
+    requested_offsets.clear()
+    assert asyncio.run(fetch()) is False
+    assert requested_offsets == [0]
+
+
+def test_unchanged_types_keep_the_cache_file(tmp_path: Path) -> None:
+    stub, _ = create_stub(revalidate=False)
+    cache = ccp.TypesCache(str(tmp_path / "types_cache.json"))
+
+    async def fetch() -> bool:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stub), base_url="http://stub") as client:
+            return await ccp.fetch_all_types_async(client, cache)
+
+    assert asyncio.run(fetch()) is True
+    saved = cache.path.read_bytes(), cache.path.stat().st_mtime_ns
+    assert asyncio.run(fetch()) is False
+    assert (cache.path.read_bytes(), cache.path.stat().st_mtime_ns) == saved
+
+
+def test_refresh_keeps_cache_when_offline(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    async def no_sleep(_: float) -> None:
+        return None
+
+    monkeypatch.setattr(ccp.asyncio, "sleep", no_sleep)
+    cache = ccp.TypesCache(str(tmp_path / "types_cache.json"))
+    cache.save({1: {"id": 1, "name": "Cached"}}, None, None)
+
+    assert asyncio.run(ccp.refresh_types(str(cache.path), base_url="http://127.0.0.1:9")) is False
+    assert cache.types() == {1: {"id": 1, "name": "Cached"}}
+
+
+def test_fetch_all_types_inside_event_loop(tmp_path: Path) -> None:
+    async def load() -> dict[int, dict]:
+        # the first catalog load can happen on the event loop, where the fetch can't be waited on
+        return tools.fetch_all_types(str(tmp_path / "types_cache.json"))
+
+    assert asyncio.run(load()) == {}
@@ -0,0 +1,52 @@
+import pytest
+
+from catalog import Catalog
+from hauling import HaulingError, plan_trips
+from store import BlueprintStore, PackedItemTypes
+
+PLATE = 1
+ORE = 2
+CHIP = 3
+UNKNOWN = 4
+
+CATALOG = Catalog(
+    version="test",
+    blueprints=BlueprintStore(),
+    item_types=PackedItemTypes.from_dict(
+        {
+            PLATE: {"name": "Plate", "mass": 20.0, "volume": 4.0},
+            ORE: {"name": "Ore", "mass": 1.0, "volume": 0.1},
+            CHIP: {"name": "Chip", "mass": 0.1, "volume": 0.01},
+        },
+    ),
+)
+
+
+def loads(stacks: dict[int, int], cargo_capacity: float, mass_limit: float | None = None) -> list[list[tuple[int, int]]]:
+    plan = plan_trips(CATALOG, stacks, cargo_capacity, mass_limit)
+    return [[(item.type_id, item.quantity) for item in trip.items] for trip in plan.trips]
+
+
+def test_large_items_first_and_stacks_split() -> None:
+    # 5 plates fill 20 m3 exactly, the ore fills the gaps left in later trips
+    assert loads({ORE: 150, PLATE: 9}, cargo_capacity=20) == [[(PLATE, 5)], [(PLATE, 4), (ORE, 40)], [(ORE, 110)]]
+
+
+def test_mass_limit() -> None:
+    assert loads({PLATE: 4}, cargo_capacity=100, mass_limit=50) == [[(PLATE, 2)], [(PLATE, 2)]]
+
+
+def test_weightless_items_ride_along() -> None:
+    assert loads({UNKNOWN: 10, PLATE: 10}, cargo_capacity=20) == [[(PLATE, 5), (UNKNOWN, 10)], [(PLATE, 5)]]
+
+
+def test_totals() -> None:
+    plan = plan_trips(CATALOG, {CHIP: 1000, ORE: 0}, cargo_capacity=5)
+    assert len(plan.trips) == 2  # noqa: PLR2004
+    assert plan.total_volume == pytest.approx(10)
+    assert plan.total_mass == pytest.approx(100)
+
+
+def test_item_larger_than_hold() -> None:
+    with pytest.raises(HaulingError):
+        plan_trips(CATALOG, {PLATE: 1}, cargo_capacity=3)
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from collections.abc import AsyncGenerator, Generator
+from http import HTTPStatus
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.pool import StaticPool
+
+from api import app
+from metrics import track_queries
+from profiling import ProfiledRoute, SlowRequestProfiler
+from schema import get_session
+
+TARGET_ITEM_ID = 88561
+
+
+@pytest.fixture(name="client")
+def client_fixture() -> Generator[TestClient, None, None]:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    track_queries(engine.sync_engine)
+
+    async def create_tables() -> None:
+        async with engine.begin() as connection:
+            await connection.run_sync(SQLModel.metadata.create_all)
+
+    async def get_session_override() -> AsyncGenerator[AsyncSession, None]:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+
+    asyncio.run(create_tables())
+    app.dependency_overrides[get_session] = get_session_override
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    asyncio.run(engine.dispose())
+
+
+def sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_record_routes_queries_and_caches(client: TestClient) -> None:
+    route = "/crafting-session/{session_uuid}"
+    requests_before = sample("http_request_duration_seconds_count", method="GET", route=route, status="200")
+    queries_before = sample("http_request_db_queries_sum", route=route)
+    hits_before = sample("cache_lookups_total", cache="item_response", result="hit")
+
+    session_uuid = client.post("/crafting-session").json()
+    assert client.get(f"/crafting-session/{session_uuid}").status_code == HTTPStatus.OK
+    client.get(f"/items/{TARGET_ITEM_ID}")
+    client.get(f"/items/{TARGET_ITEM_ID}")
+    assert client.get("/no/such/path").status_code == HTTPStatus.NOT_FOUND
+
+    assert sample("http_request_duration_seconds_count", method="GET", route=route, status="200") == requests_before + 1
+    assert sample("http_request_db_queries_sum", route=route) > queries_before
+    assert sample("cache_lookups_total", cache="item_response", result="hit") > hits_before
+    assert sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404") > 0
+
+    response = client.get("/metrics")
+    assert response.status_code == HTTPStatus.OK
+    assert 'route="/crafting-session/{session_uuid}"' in response.text
+    assert "catalog_load_seconds" in response.text
+
+
+def test_slow_request_profiler_writes_flamegraph(tmp_path: Path) -> None:
+    pytest.importorskip("pyinstrument")
+    profiled = FastAPI()
+
+    @profiled.get("/slow/{item_id}")
+    async def slow(item_id: int) -> int:
+        await asyncio.sleep(0.01)
+        return item_id
+
+    profiled.add_middleware(SlowRequestProfiler, slow_ms=5, directory=str(tmp_path))
+    with TestClient(profiled) as profiled_client:
+        assert profiled_client.get("/slow/1").status_code == HTTPStatus.OK
+
+    [profile] = tmp_path.glob("*.speedscope.json")
+    assert "GET_slow_item_id" in profile.name
+
+
+def expand_in_thread(quantity: int) -> int:
+    time.sleep(0.02)
+    return quantity
+
+
+def test_slow_request_profiler_samples_sync_endpoints(tmp_path: Path) -> None:
+    pytest.importorskip("pyinstrument")
+    profiled = FastAPI()
+    profiled.router.route_class = ProfiledRoute
+
+    @profiled.get("/sync/{quantity}")
+    def sync_endpoint(quantity: int) -> int:
+        return expand_in_thread(quantity)
+
+    profiled.add_middleware(SlowRequestProfiler, slow_ms=5, directory=str(tmp_path))
+    with TestClient(profiled) as profiled_client:
+        response = profiled_client.get("/sync/3")
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == 3  # noqa: PLR2004
+
+    [profile] = tmp_path.glob("*.speedscope.json")
+    # the endpoint ran in the threadpool, its frames only show up when that thread was sampled
+    assert "expand_in_thread" in profile.read_text()
@@ -0,0 +1,61 @@
+import random
+import uuid
+
+from catalog import Catalog
+from remaining import RemainingNeeds, remaining_needs
+from store import BlueprintStore, PackedItemTypes
+
+ORE = 1
+GAS = 2
+PLATE = 10
+FRAME = 11
+HULL = 12
+
+CATALOG = Catalog(
+    version="test",
+    blueprints=BlueprintStore.from_dicts({
+        PLATE: [{"bp_id": 100, "materials": [{"typeID": ORE, "quantity": 4}], "product_count": 2}],
+        FRAME: [{"bp_id": 110, "materials": [{"typeID": PLATE, "quantity": 3}, {"typeID": GAS, "quantity": 1}], "product_count": 1}],
+        HULL: [{"bp_id": 120, "materials": [{"typeID": FRAME, "quantity": 2}, {"typeID": PLATE, "quantity": 1}], "product_count": 1}],
+    }),
+    item_types=PackedItemTypes.from_dict({ORE: {"name": "Ore"}, GAS: {"name": "Gas"}, PLATE: {"name": "Plate"}, FRAME: {"name": "Frame"}}),
+)
+
+
+def remaining(needs: RemainingNeeds) -> dict[int, int]:
+    return {need.item_id: need.remaining for need in needs.needs()}
+
+
+def test_inventory_removes_the_subtree() -> None:
+    needs = RemainingNeeds(CATALOG)
+    needs.update({FRAME: 2}, {})
+    assert remaining(needs) == {FRAME: 2, PLATE: 6, GAS: 2, ORE: 12}
+
+    # two plates on hand save one run of plates and its ore
+    needs.update({FRAME: 2}, {PLATE: 2})
+    assert remaining(needs) == {FRAME: 2, PLATE: 4, GAS: 2, ORE: 8}
+
+    # frames on hand remove everything below them
+    needs.update({FRAME: 2}, {PLATE: 2, FRAME: 2})
+    assert remaining(needs) == {}
+
+
+def test_incremental_updates_match_a_fresh_expansion() -> None:
+    rng = random.Random(0)  # noqa: S311
+    needs = RemainingNeeds(CATALOG)
+    for _ in range(200):
+        demand = {item_id: rng.randint(0, 5) for item_id in rng.sample([ORE, PLATE, FRAME, HULL], 2)}
+        inventory = {item_id: rng.randint(0, 6) for item_id in rng.sample([ORE, GAS, PLATE, FRAME], 2)}
+        needs.update(demand, inventory)
+
+        fresh = RemainingNeeds(CATALOG)
+        fresh.update(demand, inventory)
+        assert needs.needs() == fresh.needs()
+
+
+def test_needs_are_reused_per_session() -> None:
+    session_uuid = uuid.uuid4()
+    first = remaining_needs(CATALOG, session_uuid, {PLATE: 1}, {})
+    second = remaining_needs(CATALOG, session_uuid, {PLATE: 3}, {})
+    assert first is second
+    assert remaining(second) == {PLATE: 3, ORE: 8}
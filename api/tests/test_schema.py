@@ -0,0 +1,46 @@
+import asyncio
+import sqlite3
+from pathlib import Path
+from unittest.mock import patch
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import schema
+
+
+def test_migration_adds_indexes_to_existing_database(tmp_path: Path) -> None:
+    db_path = tmp_path / "crafting_tool.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        """
+        CREATE TABLE craftingsession (id INTEGER PRIMARY KEY, session_uuid CHAR(32) NOT NULL);
+        CREATE TABLE craftingtarget (
+            id INTEGER PRIMARY KEY, item_id INTEGER NOT NULL, needed_quantity INTEGER NOT NULL,
+            blueprint_id INTEGER NOT NULL, crafted_quantity INTEGER NOT NULL, session_id INTEGER NOT NULL
+        );
+        CREATE TABLE craftingingredient (
+            id INTEGER PRIMARY KEY, item_id INTEGER NOT NULL, needed_quantity INTEGER NOT NULL,
+            crafted_quantity INTEGER NOT NULL, target_id INTEGER NOT NULL
+        );
+        """,
+    )
+    conn.close()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    event.listen(engine.sync_engine, "connect", schema.apply_sqlite_pragmas)
+    with patch.object(schema, "engine", engine):
+        asyncio.run(schema.create_db_and_tables())
+    asyncio.run(engine.dispose())
+
+    conn = sqlite3.connect(db_path)
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.close()
+
+    assert {
+        "ix_craftingsession_session_uuid",
+        "ix_craftingtarget_session_id_item_id",
+        "ix_craftingingredient_target_id_item_id",
+    } <= indexes
+    assert journal_mode == "wal"
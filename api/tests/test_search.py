@@ -0,0 +1,48 @@
+from search import SearchIndex
+
+ITEM_TYPES = {
+    1: {"name": "Carbon Weave"},
+    2: {"name": "Carbon"},
+    3: {"name": "Reinforced Carbon Plate"},
+    4: {"name": "Carbonado"},
+    5: {"name": "Iron Ore"},
+}
+
+
+def test_search_ranks_exact_prefix_then_substring() -> None:
+    index = SearchIndex(ITEM_TYPES, craftable_ids=[1, 3])
+    results = index.search("CARBON")
+    assert [result["id"] for result in results] == [2, 4, 1, 3]
+
+
+def test_search_short_and_missing_queries() -> None:
+    index = SearchIndex(ITEM_TYPES, craftable_ids=[])
+    assert [result["id"] for result in index.search("or")] == [5, 3]
+    assert index.search("xyzzy") == []
+    assert index.search("") == []
+
+
+def test_search_limit_offset_and_craftable() -> None:
+    index = SearchIndex(ITEM_TYPES, craftable_ids=[1, 3])
+    assert [result["id"] for result in index.search("carbon", limit=2, offset=1)] == [4, 1]
+    assert index.search("carbon", craftable_only=True) == [{"name": "Carbon Weave", "id": 1}, {"name": "Reinforced Carbon Plate", "id": 3}]
+
+
+def test_search_pages_match_the_full_ranking() -> None:
+    item_types = {item_id: {"name": name} for item_id, name in enumerate(["Carbon", "Carbonado", "Carbon Weave", "Reinforced Carbon Plate", "Carbon Carbide", "Arc Carbonizer", "Iron Ore", "Ore Carbon"])}
+    index = SearchIndex(item_types, craftable_ids=[2, 3, 5])
+
+    for query in ("c", "ca", "car", "carb", "carbon", "carbon c", "bon", "arbon p", "ore", "zzz"):
+        ranked = sorted(
+            (item_id for item_id, item in item_types.items() if query in item["name"].casefold()),
+            key=lambda item_id: (
+                item_types[item_id]["name"].casefold() != query,
+                not item_types[item_id]["name"].casefold().startswith(query),
+                len(item_types[item_id]["name"]),
+                item_types[item_id]["name"].casefold(),
+            ),
+        )
+        assert [result["id"] for result in index.search(query)] == ranked
+        for offset in range(len(ranked)):
+            assert [result["id"] for result in index.search(query, limit=2, offset=offset)] == ranked[offset : offset + 2]
+        assert [result["id"] for result in index.search(query, craftable_only=True)] == [item_id for item_id in ranked if item_id in {2, 3, 5}]
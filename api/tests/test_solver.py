@@ -0,0 +1,59 @@
+import math
+
+import pytest
+
+from bom import CycleError
+from solver import BlueprintSolver
+from store import BlueprintStore
+
+ORE = 1
+GAS = 2
+
+BLUEPRINTS = BlueprintStore.from_dicts({
+    10: [{"bp_id": 100, "materials": [{"typeID": ORE, "quantity": 4}], "product_count": 2, "time": 10, "structures": ["Refinery"]}],
+    11: [
+        {"bp_id": 110, "materials": [{"typeID": 10, "quantity": 3}], "product_count": 1, "time": 5, "structures": ["Printer"]},
+        {"bp_id": 111, "materials": [{"typeID": GAS, "quantity": 10}], "product_count": 1, "time": 100, "structures": ["Assembler"]},
+    ],
+    12: [
+        {"bp_id": 120, "materials": [{"typeID": 11, "quantity": 2}, {"typeID": 10, "quantity": 1}], "product_count": 1, "time": 1, "structures": ["Refinery"]},
+    ],
+})
+
+
+def test_objectives_pick_different_blueprints() -> None:
+    raw = BlueprintSolver(BLUEPRINTS, "raw")
+    assert raw.choice[11] == 110  # noqa: PLR2004
+    assert raw.total(12) == 14  # noqa: PLR2004
+    assert raw.total(ORE, 3) == 3  # noqa: PLR2004
+
+    fastest = BlueprintSolver(BLUEPRINTS, "time")
+    assert fastest.choice[11] == 110  # noqa: PLR2004
+    # 1 for item 12, 2 * (5 + 3 * 5) for item 11 and 5 for the extra item 10
+    assert fastest.total(12, 2) == 2 * 46
+
+    fewest = BlueprintSolver(BLUEPRINTS, "structures")
+    # the Assembler route needs one structure for item 11, the Printer route also needs the Refinery
+    assert fewest.choice[11] == 111  # noqa: PLR2004
+    assert fewest.structures[12] == {"Assembler", "Refinery"}
+    assert fewest.total(12) == 2  # noqa: PLR2004
+
+
+def test_owned_structures_limit_the_blueprints() -> None:
+    solver = BlueprintSolver(BLUEPRINTS, "raw", ["Assembler", "Refinery"])
+    assert solver.choice[11] == 111  # noqa: PLR2004
+    assert solver.total(12) == 22  # noqa: PLR2004
+
+    no_refinery = BlueprintSolver(BLUEPRINTS, "raw", ["Printer", "Assembler"])
+    assert not {10, 12} & no_refinery.choice.keys()
+    assert no_refinery.choice[11] == 111  # noqa: PLR2004
+    assert math.isinf(no_refinery.total(12))
+
+
+def test_cyclic_items_are_rejected() -> None:
+    blueprints = BlueprintStore.from_dicts({
+        20: [{"bp_id": 200, "materials": [{"typeID": 21, "quantity": 1}], "product_count": 1}],
+        21: [{"bp_id": 210, "materials": [{"typeID": 20, "quantity": 1}], "product_count": 1}],
+    })
+    with pytest.raises(CycleError):
+        BlueprintSolver(blueprints).total(20)
@@ -0,0 +1,60 @@
+from store import BlueprintStore, PackedItemTypes
+
+BLUEPRINTS = {
+    20: [
+        {"bp_id": 200, "structures": ["Printer"], "materials": [{"typeID": 1, "quantity": 5}, {"typeID": 2, "quantity": 3}], "time": 10, "max_production": 100, "product_count": 2},
+        {"bp_id": 201, "structures": ["Printer"], "materials": [{"typeID": 1, "quantity": 9}], "time": 5, "max_production": 50, "product_count": 1},
+    ],
+    10: [{"bp_id": 100, "structures": [], "materials": [], "time": 1, "max_production": 1, "product_count": 1}],
+}
+ITEM_TYPES = {1: {"name": "Ore"}, 20: {"name": "Plate"}}
+PLATE_ID = 20
+MISSING_ID = 30
+
+
+def test_store_views_match_source_blueprints() -> None:
+    store = BlueprintStore.from_dicts(BLUEPRINTS, ITEM_TYPES)
+
+    assert list(store) == [10, 20]
+    assert PLATE_ID in store
+    assert MISSING_ID not in store
+    assert store.get(MISSING_ID) is None
+    assert store[20][0].to_dict() == {
+        "bp_id": 200,
+        "structures": ["Printer"],
+        "materials": [{"quantity": 5, "typeID": 1, "name": "Ore"}, {"quantity": 3, "typeID": 2, "name": "Unknown"}],
+        "time": 10,
+        "max_production": 100,
+        "product_count": 2,
+        "product_name": "Plate",
+    }
+    assert list(store[20][1].material_pairs()) == [(1, 9)]
+    assert store.blueprint(20, 201) is not None
+    assert store.blueprint(20, 100) is None
+    # identical structure lists are stored once
+    assert store[20][0].structures is store[20][1].structures
+
+
+def test_used_in_index() -> None:
+    store = BlueprintStore.from_dicts(BLUEPRINTS, ITEM_TYPES)
+
+    assert [(bp.bp_id, bp.product_id) for bp in store.used_in(1)] == [(200, PLATE_ID), (201, PLATE_ID)]
+    assert [bp.bp_id for bp in store.used_in(2)] == [200]
+    assert store.used_in(PLATE_ID) == ()
+
+
+def test_packed_item_types() -> None:
+    item_types = PackedItemTypes.from_dict(ITEM_TYPES)
+
+    assert item_types == ITEM_TYPES
+    assert item_types[PLATE_ID] == {"name": "Plate"}
+    assert MISSING_ID not in item_types
+    assert item_types.get(MISSING_ID, {}).get("name", "Unknown") == "Unknown"
+
+
+def test_packed_item_types_physical_columns() -> None:
+    item_types = PackedItemTypes.from_dict({1: {"name": "Ore", "mass": 2.5, "volume": 0.1}, 20: {"name": "Plate", "mass": None}})
+
+    masses, volumes = item_types.physical([20, MISSING_ID, 1])
+    assert list(masses) == [0.0, 0.0, 2.5]
+    assert list(volumes) == [0.0, 0.0, 0.1]
@@ -0,0 +1,49 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+
+from transfer import (
+    ExportFormat,
+    SessionImportError,
+    decode_records,
+    encode_records,
+    iterate,
+)
+
+
+async def chunked(body: bytes, size: int) -> AsyncIterator[bytes]:
+    for start in range(0, len(body), size):
+        yield body[start : start + size]
+
+
+async def collect(body: bytes, export_format: ExportFormat, size: int = 7) -> list[dict]:
+    return [record.model_dump(exclude_defaults=True) async for record in decode_records(chunked(body, size), export_format)]
+
+
+def test_records_survive_a_round_trip_across_chunks() -> None:
+    records = [
+        {"record": "target", "target_id": 3, "item_id": 10, "blueprint_id": 100, "needed_quantity": 2},
+        {"record": "ingredient", "target_id": 3, "item_id": 1, "needed_quantity": 8, "crafted_quantity": 5},
+        {"record": "inventory", "item_id": 1, "quantity": 4},
+    ]
+    fields = ("record", "target_id", "item_id", "blueprint_id", "needed_quantity", "crafted_quantity", "quantity")
+
+    async def round_trip(export_format: ExportFormat) -> list[dict]:
+        body = b"".join([line async for line in encode_records(iterate(records), export_format, fields)])
+        return await collect(body, export_format)
+
+    assert asyncio.run(round_trip("ndjson")) == records
+    assert asyncio.run(round_trip("csv")) == records
+
+
+def test_invalid_lines_report_their_number() -> None:
+    body = b'{"record": "inventory", "item_id": 1, "quantity": 4}\n\n{"record": "unknown", "item_id": 1}\n'
+    with pytest.raises(SessionImportError, match="Line 3"):
+        asyncio.run(collect(body, "ndjson"))
+
+
+def test_lines_that_arent_utf8_report_their_number() -> None:
+    body = b'{"record": "inventory", "item_id": 1, "quantity": 4}\n{"record": "inventory", "note": "caf\xe9"}\n'
+    with pytest.raises(SessionImportError, match="Line 2"):
+        asyncio.run(collect(body, "ndjson"))
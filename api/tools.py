@@ -1,107 +1,47 @@
 #!/usr/bin/env python3
 
+import asyncio
 import json
 import sqlite3
 from pathlib import Path
 
-import httpx
+from ccp import TYPES_CACHE_FILENAME, TypesCache, refresh_types
 
-CCP_BASE_URL = "https://blockchain-gateway-stillness.live.tech.evefrontier.com"
-ccp_client = httpx.Client(base_url=CCP_BASE_URL)
 CARBON_ORE_ID = 77811
 
 
-def item_search(item_types: dict[int, dict], item_name: str) -> list[dict[str, str]]:
-    """
-    Search for an item by string in the item name.
-    """
-    results = []
-    for item_id, item in item_types.items():
-        if item_name.lower() in item["name"].lower():
-            results.append({"name": item["name"], "id": item_id})
-    return results
-
-
 def how_much_carbon(target_item_id: int) -> float:
     """
     Calculate the total amount of carbon (ID: 77811) needed to craft an item.
-    This function handles multiple blueprints, recursive materials, and uses memoization
+    For items with multiple blueprints the one that uses the least carbon is picked at every level.
     """
-    # Load crafting data once
-    crafting, _ = create_crafting_json("blueprint.db", "structure_names.json", "item_types.json")
-
-    # Cache to store results and avoid recalculation
-    cache: dict[int, float] = {}
-
-    def _calculate_carbon(item_id: int) -> float:
-        """
-        Recursive helper function to calculate carbon needed for an item.
-        """
-        # Check cache first
-        if item_id in cache:
-            return cache[item_id]
-
-        # If item is carbon itself, return 1
-        if item_id == CARBON_ORE_ID:
-            cache[item_id] = 1
-            return 1
-
-        # If item has no crafting recipe, it requires 0 carbon
-        if item_id not in crafting:
-            cache[item_id] = 0
-            return 0
-
-        blueprints = crafting[item_id]
-        max_carbon = 0
-
-        # Try each blueprint and find the one that uses the least carbon
-        for blueprint in blueprints:
-            total_carbon = 0.0
-
-            # Sum carbon from all materials in this blueprint
-            for material in blueprint["materials"]:
-                material_id = int(material["typeID"])
-                material_quantity = float(material["quantity"])
-
-                # Recursively calculate carbon for this material
-                carbon_per_unit = _calculate_carbon(material_id)
-                print(f"Material Name: {material['name']}")
-                print(f"Carbon per unit: {carbon_per_unit}")
-                total_carbon += carbon_per_unit * material_quantity
-                print(f"Total carbon: {total_carbon}")
-                print()
-
-            # Account for the number of items this blueprint produces
-            product_count = blueprint.get("product_count", 1)
-            carbon_per_product = total_carbon / product_count
-
-            # Keep track of the highest cost blueprint
-            max_carbon = max(max_carbon, carbon_per_product)
-
-        # If no valid blueprint found, return 0
-        result = 0 if max_carbon == 0 else float(max_carbon)
-        cache[item_id] = result
-        return result
+    # imported here since the catalog is built from this module
+    from catalog import get_catalog  # noqa: PLC0415
 
-    return _calculate_carbon(target_item_id)
+    table = get_catalog().bom("min", weights={CARBON_ORE_ID: 1})
+    return table.raw_materials(target_item_id).get(CARBON_ORE_ID, 0.0)
 
 
-def fetch_all_types() -> dict[int, dict]:
+def fetch_all_types(cache_filename: str = TYPES_CACHE_FILENAME) -> dict[int, dict]:
     """
-    Fetch all item types from the CCP API and save to a JSON file.
-
-    TODO: Handle pagination, right now there's enough items to fit in one request
+    Return all item types from the on-disk types cache, fetching them from the CCP API on the first run.
+    The cache is refreshed in the background by the API, so this never waits on the network once it exists.
     """
-    item_types = {}
-    result = ccp_client.get("/v2/types?limit=1000")
-
-    for item in result.json()["data"]:
+    cache = TypesCache(cache_filename)
+    item_types = cache.types()
+    if item_types is None:
         try:
-            item_types[int(item["id"])] = item
-        except KeyError:
-            print(f"KeyError: {item}")
-            continue
-
+            asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(refresh_types(cache_filename))
+            item_types = cache.types()
+        else:
+            # can't wait on the fetch from inside an event loop, the API's startup refresh fills the cache
+            print("Types cache not fetched yet, loading the catalog without item types")
+
+    if item_types is None:
+        print("No types catalog available, item names will be unknown")
+        return {}
     return item_types
 
 
@@ -178,17 +118,15 @@ def create_crafting_json(
     for bp in bps:
         if bp["activities"] and bp["activities"]["manufacturing"]:
             product_results = bp["activities"]["manufacturing"]["products"]
-            materials = bp["activities"]["manufacturing"]["materials"]
+            # give the materials a human readable name, without mutating the source blueprint
+            materials = [
+                {**material, "name": item_types.get(int(material["typeID"]), {}).get("name", "Unknown")}
+                for material in bp["activities"]["manufacturing"]["materials"]
+            ]
             time = bp["activities"]["manufacturing"]["time"]
             bp_id = int(bp["blueprintTypeID"])
             max_production = bp["maxProductionLimit"]
 
-            # give the materials a human readable name
-            for material in materials:
-                material_id = int(material["typeID"])
-                material_name = item_types.get(material_id, {}).get("name", "Unknown")
-                material["name"] = material_name
-
             for product in product_results:
                 product_id = product["typeID"]
                 product_count = product["quantity"]
@@ -0,0 +1,87 @@
+import csv
+import io
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from typing import Any, Literal
+
+import orjson
+from pydantic import ValidationError
+
+from models import SessionRecord
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES: dict[ExportFormat, str] = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# CSV columns of a session export, a record only fills the columns that apply to it
+SESSION_FIELDS = ("record", "target_id", "item_id", "blueprint_id", "needed_quantity", "crafted_quantity", "quantity")
+PLAN_FIELDS = ("record", "item_id", "name", "blueprint_id", "runs", "needed_quantity", "produced_quantity", "time", "structures")
+
+
+class SessionImportError(ValueError):
+    """
+    Raised when an imported session file can't be read or refers to records it doesn't contain.
+    """
+
+
+def csv_line(values: Iterable[Any]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(";".join(value) if isinstance(value, list) else value for value in values)
+    return buffer.getvalue().encode()
+
+
+async def encode_records(records: AsyncIterable[dict[str, Any]], export_format: ExportFormat, fields: tuple[str, ...]) -> AsyncIterator[bytes]:
+    """
+    Serialize records one line at a time, as JSON objects or as CSV rows with a header of fields.
+    """
+    if export_format == "csv":
+        yield csv_line(fields)
+    async for record in records:
+        if export_format == "csv":
+            yield csv_line(record.get(field) for field in fields)
+        else:
+            yield orjson.dumps(record) + b"\n"
+
+
+async def iterate(records: Iterable[dict[str, Any]]) -> AsyncIterator[dict[str, Any]]:
+    for record in records:
+        yield record
+
+
+async def lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[tuple[int, bytes]]:
+    """
+    Split a streamed body into numbered lines, only the current partial line is buffered.
+    """
+    pending = b""
+    number = 0
+    async for chunk in chunks:
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
+        for line in complete:
+            number += 1
+            yield number, line
+    if pending:
+        yield number + 1, pending
+
+
+async def decode_records(chunks: AsyncIterable[bytes], export_format: ExportFormat) -> AsyncIterator[SessionRecord]:
+    """
+    Parse and validate the records of a session export as they arrive, blank lines are skipped.
+    """
+    header: list[str] | None = None
+    async for number, raw_line in lines(chunks):
+        if not raw_line.strip():
+            continue
+        try:
+            # decoded here, so a file that isn't UTF-8 is reported like any other unreadable line
+            line = raw_line.decode()
+            if export_format == "ndjson":
+                record = SessionRecord.model_validate_json(line)
+            else:
+                row = next(csv.reader([line]))
+                if header is None:
+                    header = row
+                    continue
+                record = SessionRecord.model_validate({field: value for field, value in zip(header, row, strict=False) if value != ""})
+        except (UnicodeDecodeError, ValidationError, csv.Error) as e:
+            msg = f"Line {number}: {e}"
+            raise SessionImportError(msg) from e
+        yield record